@@ -0,0 +1,167 @@
+# Times get_movie_info end to end against the local stand-in servers, with no network access needed.
+# Run from the repo root:
+#     python -m benchmarks.get_movie_info_throughput [--rows 100 1000 10000] [--workers 8] [--latency 0.05] [--error-rate 0.01]
+# For each size a synthetic workbook is generated and the real get_movie_info (with save_progress writing the
+# journal) is run non-interactively in its own process and temporary folder, starting from the spreadsheet
+# with an empty response cache. Rows/second, wall time, peak RSS and requests per source are printed,
+# and saved with --output so runs before and after a change can be compared.
+# Site rate limits are lifted unless --keep-rate-limits is given, otherwise they decide the timings.
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from benchmarks.stand_in_servers import SOURCES, start_server, point_sites_at, film_title, film_year, film_is_tv, film_slug
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak RSS is left out there
+    resource = None
+
+DEFAULT_ROWS = [100, 1000, 10000]
+BENCHMARK_USERNAME = "benchmark-user"
+RESULT_FILE = "benchmark_result.json"
+LOG_FILE = "benchmark.log"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def generate_workbook(path, num_rows):
+    rows = [
+        {
+            "Movie Title": film_title(number),
+            "Year": film_year(number),
+            "Franchise": None,
+            "Medium": "Mini Series" if film_is_tv(number) else "Movie",
+            "Decade": f"{film_year(number) // 10 * 10}s"
+        }
+        for number in range(1, num_rows + 1)
+    ]
+    pd.DataFrame(rows).to_excel(path, index=False)
+
+def write_user_ratings(path, num_rows):
+    # every third film is logged on Letterboxd, so its row gets its slug from the ratings instead of a search
+    movies = {
+        film_slug(number): {"name": film_title(number), "year": film_year(number), "rating": number % 10 + 1 if number % 2 else None, "slug": film_slug(number)}
+        for number in range(3, num_rows + 1, 3)
+    }
+    with open(path, 'w') as f:
+        json.dump({"username": BENCHMARK_USERNAME, "movies": movies, "count": len(movies)}, f)
+
+def set_up_run_folder(num_rows):
+    folder = tempfile.mkdtemp(prefix=f"get_movie_info_{num_rows}_")
+    for subfolder in ["input", "output", os.path.join("src", "tmp")]:
+        os.makedirs(os.path.join(folder, subfolder))
+    filename = f"benchmark_{num_rows}.xlsx"
+    generate_workbook(os.path.join(folder, "input", filename), num_rows)
+    write_user_ratings(os.path.join(folder, "user_ratings.json"), num_rows)
+    with open(os.path.join(folder, "tmdb_api_key.txt"), 'w') as f:
+        f.write("benchmark")
+    return folder, filename
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+def run_one(filename, base_url, workers, keep_rate_limits, cache_mode):
+    # runs inside the run folder, in a process of its own so peak RSS is just this run's
+    from src.get_movie_info import get_movie_info, SITE_LIMITS
+    point_sites_at(base_url)
+    site_limits = None if keep_rate_limits else {site: {} for site in SITE_LIMITS}
+    num_rows = len(pd.read_excel("input/" + filename))
+    start = time.perf_counter()
+    get_movie_info(filename, BENCHMARK_USERNAME, workers, site_limits, cache_mode, mode='s', check_all=True)
+    wall_seconds = time.perf_counter() - start
+    with open("output/output-" + filename.replace(".xlsx", "_run_report.json"), 'r', encoding='utf-8') as f:
+        report = json.load(f)
+    result = {
+        "rows": num_rows,
+        "wall_seconds": wall_seconds,
+        "rows_per_second": num_rows / wall_seconds,
+        "peak_rss_mb": peak_rss_mb(),
+        "operations": {name: {"calls": operation["calls"], "errors": operation["errors"], "total_seconds": operation["total_seconds"]} for name, operation in report["operations"].items()}
+    }
+    with open(RESULT_FILE, 'w') as f:
+        json.dump(result, f, indent=2)
+
+def run_size(server, num_rows, args):
+    folder, filename = set_up_run_folder(num_rows)
+    command = [
+        sys.executable, "-m", "benchmarks.get_movie_info_throughput", "--run-one", filename, "--base-url", server.base_url,
+        "--workers", str(args.workers), "--cache-mode", args.cache_mode
+    ] + (["--keep-rate-limits"] if args.keep_rate_limits else [])
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get("PYTHONPATH")])))
+    server.reset_counts()
+    try:
+        with open(os.path.join(folder, LOG_FILE), 'w') as log:
+            completed = subprocess.run(command, cwd=folder, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Error: benchmark run of {num_rows} rows failed, see '{os.path.join(folder, LOG_FILE)}'.")
+        with open(os.path.join(folder, RESULT_FILE), 'r') as f:
+            result = json.load(f)
+    except Exception:
+        args.keep_folders = True
+        raise
+    finally:
+        if not args.keep_folders:
+            shutil.rmtree(folder, ignore_errors=True)
+    result["requests"] = server.reset_counts()
+    result["folder"] = folder if args.keep_folders else None
+    return result
+
+def format_results(results):
+    lines = [f"{'Rows':>7}{'Wall s':>10}{'Rows/s':>10}{'Peak RSS MB':>13}" + ''.join(f"{source:>17}" for source in SOURCES)]
+    for result in results:
+        peak_rss = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "n/a"
+        lines.append(
+            f"{result['rows']:>7}{result['wall_seconds']:>10.2f}{result['rows_per_second']:>10.1f}{peak_rss:>13}"
+            + ''.join(f"{result['requests'].get(source, 0):>17}" for source in SOURCES)
+        )
+    return '\n'.join(lines)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Time get_movie_info against local stand-in servers.")
+    parser.add_argument("--rows", type=int, nargs='+', default=DEFAULT_ROWS, help="workbook sizes to run")
+    parser.add_argument("--workers", type=int, default=8, help="max_workers passed to get_movie_info")
+    parser.add_argument("--latency", type=float, default=0.05, help="average seconds each stand-in response is delayed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with a 503 (TMDB, IMDb, Rotten Tomatoes, awards)")
+    parser.add_argument("--letterboxd-error-rate", type=float, default=0.0, help="share of Letterboxd requests answered with a 503, these end the run as they would live")
+    parser.add_argument("--cache-mode", default='use', help="cache_mode passed to get_movie_info, every run starts with an empty cache")
+    parser.add_argument("--keep-rate-limits", action='store_true', help="use SITE_LIMITS instead of lifting them")
+    parser.add_argument("--keep-folders", action='store_true', help="keep each run's temporary folder (workbook, journal, output, log)")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the stand-in latency and errors")
+    parser.add_argument("--output", help="also save the results to this JSON file")
+    parser.add_argument("--run-one", help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.run_one:
+        run_one(args.run_one, args.base_url, args.workers, args.keep_rate_limits, args.cache_mode)
+        return
+    error_rates = {source: args.error_rate for source in SOURCES if source != "letterboxd"}
+    error_rates["letterboxd"] = args.letterboxd_error_rate
+    server = start_server(args.latency, error_rates, args.seed)
+    results = []
+    try:
+        for num_rows in args.rows:
+            print(f"Running {num_rows} rows...")
+            results.append(run_size(server, num_rows, args))
+    finally:
+        server.shutdown()
+    print(format_results(results))
+    if args.output:
+        settings = {k: v for k, v in vars(args).items() if k not in ["run_one", "base_url", "output"]}
+        with open(args.output, 'w') as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+        print(f"Results saved to '{args.output}'")
+
+if __name__ == "__main__":
+    main()
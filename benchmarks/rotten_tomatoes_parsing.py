@@ -0,0 +1,64 @@
+# Compares the regex Rotten Tomatoes extraction against the old BeautifulSoup parse on saved pages.
+# Run from the repo root:
+#     python -m benchmarks.rotten_tomatoes_parsing [pages folder] [repeats]
+# Pages named search_*.html are read as search pages, detail_*.html as film pages.
+# Both parsers must give the same rows and scorecards; timings are printed per page.
+import glob
+import json
+import os
+import sys
+import timeit
+from bs4 import BeautifulSoup
+from src.request_movie_site_data import iter_rotten_tomatoes_search_rows, extract_rotten_tomatoes_scorecard
+
+DEFAULT_PAGES_FOLDER = "benchmarks/fixtures/rotten_tomatoes"
+
+def legacy_search_rows(page, medium_type, release_year_str):
+    # the parse scrape_rotten_tomatoes used before, collecting every row instead of returning on a match
+    rows = []
+    rt_response_html = BeautifulSoup(page, 'html.parser')
+    movie_results = rt_response_html.find_all('search-page-result',type=medium_type)
+    movie_results = BeautifulSoup(str(movie_results),'html.parser')
+    movie_rows = movie_results.find_all('search-page-media-row')
+    for movie_row in movie_rows:
+        release_year = movie_row.get(release_year_str, '')
+        if not release_year.isdigit():
+            continue
+        href = movie_row.find('a',slot='title')
+        rows.append((int(release_year), href.text.strip(), movie_row.get('cast', ''), href['href'].strip()))
+    return rows
+
+def legacy_scorecard(page):
+    rt_response_html = BeautifulSoup(page, 'html.parser')
+    return json.loads(rt_response_html.find('script', id="media-scorecard-json").text.strip())
+
+def time_call(function, repeats):
+    return min(timeit.repeat(function, number=1, repeat=repeats)) * 1000
+
+def compare_pages(pages_folder=DEFAULT_PAGES_FOLDER, repeats=20):
+    mismatches = 0
+    for path in sorted(glob.glob(os.path.join(pages_folder, "*.html"))):
+        with open(path, 'r', encoding='utf-8') as f:
+            page = f.read()
+        name = os.path.basename(path)
+        if name.startswith("search_"):
+            checks = [
+                (f"{name} ({medium_type})", lambda: legacy_search_rows(page, medium_type, release_year_str), lambda: list(iter_rotten_tomatoes_search_rows(page, medium_type, release_year_str)))
+                for medium_type, release_year_str in [("movie", "release-year"), ("tvSeries", "startyear")]
+            ]
+        elif name.startswith("detail_"):
+            checks = [(name, lambda: legacy_scorecard(page), lambda: extract_rotten_tomatoes_scorecard(page))]
+        else:
+            continue
+        for label, legacy, fast in checks:
+            same = legacy() == fast()
+            mismatches += not same
+            legacy_ms = time_call(legacy, repeats)
+            fast_ms = time_call(fast, repeats)
+            print(f"{label}: BeautifulSoup {legacy_ms:.2f} ms, regex {fast_ms:.2f} ms ({legacy_ms / fast_ms:.1f}x){'' if same else ' - RESULTS DIFFER'}")
+    return mismatches
+
+if __name__ == "__main__":
+    pages_folder = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PAGES_FOLDER
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    sys.exit(1 if compare_pages(pages_folder, repeats) else 0)
@@ -0,0 +1,256 @@
+# Local stand-in for every site get_movie_info talks to, so runs can be timed without network access.
+# One HTTP server answers for all of them under a path prefix per source (/tmdb, /imdb, /rotten_tomatoes,
+# /oscars, /letterboxd) and URLs are pointed at it with transport.url_rewrites (see point_sites_at).
+# Responses are shaped like recorded ones, only keeping the fields the program reads, and are built from
+# the film number in the request so any number of synthetic films can be served (see film_title).
+# Each request can be delayed (latency, in seconds) and failed with a 503 (error_rates, per source).
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote
+import requests
+from letterboxdpy.core.scraper import Scraper
+from src import transport
+
+SITE_URLS = {
+    "tmdb": "https://api.themoviedb.org",
+    "imdb": "https://api.imdbapi.dev",
+    "rotten_tomatoes": "https://www.rottentomatoes.com",
+    "oscars": "https://web-production-b8145.up.railway.app",
+    "letterboxd": "https://letterboxd.com",
+}
+SOURCES = list(SITE_URLS)
+FIRST_YEAR = 1950
+IMDB_ID_OFFSET = 9000000
+TMDB_ID_OFFSET = 500000
+FILM_NUMBER_PATTERN = re.compile(r'(\d+)')
+
+def film_title(number):
+    return f"Benchmark Film {number}"
+
+def film_year(number):
+    return FIRST_YEAR + number % 70
+
+def film_is_tv(number):
+    return number % 20 == 0
+
+def film_imdb_id(number):
+    return f"tt{IMDB_ID_OFFSET + number}"
+
+def film_slug(number):
+    return f"benchmark-film-{number}"
+
+def film_number(text, offset=0):
+    match = FILM_NUMBER_PATTERN.search(text)
+    return int(match.group(1)) - offset if match else None
+
+def film_has_awards(number):
+    return number % 5 == 0
+
+def film_nominations(number):
+    return [
+        {"category": "Best Picture", "names": [{"name": f"Producer {number}"}], "isWinner": "1" if number % 10 == 0 else "0"},
+        {"category": "Best Director", "names": [{"name": f"Director {number}"}], "isWinner": "0"}
+    ]
+
+def tmdb_response(path, query):
+    parts = path.strip('/').split('/')[1:]  # drop the '3' API version
+    if parts[0] == "search":
+        number = film_number(query.get("query", [""])[0])
+        return {"results": [{"id": TMDB_ID_OFFSET + number}] if number is not None else []}
+    if parts[0] == "find":
+        number = film_number(parts[1], IMDB_ID_OFFSET)
+        result = [{"id": TMDB_ID_OFFSET + number}]
+        return {"movie_results": [] if film_is_tv(number) else result, "tv_results": result if film_is_tv(number) else []}
+    number = int(parts[1]) - TMDB_ID_OFFSET
+    info = {
+        "id": int(parts[1]),
+        "origin_country": ["AU"] if number % 3 == 0 else ["US"],
+        "spoken_languages": [{"english_name": "English"}],
+        "credits": {"crew": [{"job": "Director", "name": f"Director {number}"}, {"job": "Writer", "name": f"Writer {number}"}]}
+    }
+    if parts[0] == "movie":
+        info.update({
+            "runtime": 80 + number % 60,
+            "budget": number * 1000,
+            "revenue": number * 3000,
+            "imdb_id": film_imdb_id(number),
+            "belongs_to_collection": {"name": f"Benchmark {number % 50} Collection"} if number % 4 == 0 else None,
+            "releases": {"countries": [{"iso_3166_1": "US", "certification": "PG-13"}, {"iso_3166_1": "AU", "certification": "M"}]}
+        })
+    return info
+
+def imdb_response(path, query):
+    if path == "/titles:batchGet":
+        return {"titles": [imdb_title(film_number(imdb_id, IMDB_ID_OFFSET)) for imdb_id in query.get("titleIds", [])]}
+    return imdb_title(film_number(path.rsplit('/', 1)[1], IMDB_ID_OFFSET))
+
+def imdb_title(number):
+    title = {
+        "id": film_imdb_id(number),
+        "rating": {"aggregateRating": round(5 + number % 50 / 10, 1)},
+        "primaryImage": {"url": f"https://example.com/posters/{number}.jpg"}
+    }
+    if number % 7:
+        title["metacritic"] = {"score": 40 + number % 60}
+    return title
+
+def rotten_tomatoes_response(path, query):
+    if path == "/search":
+        number = film_number(query.get("search", [""])[0])
+        if number is None:
+            return "<html><body></body></html>"
+        medium_type, release_year_str = ("tvSeries", "startyear") if film_is_tv(number) else ("movie", "release-year")
+        return (
+            f'<html><body><search-page-result type="{medium_type}"><ul>'
+            f'<search-page-media-row {release_year_str}="{film_year(number)}" cast="Actor {number} A,Actor {number} B">'
+            f'<a href="{SITE_URLS["rotten_tomatoes"]}/m/benchmark_film_{number}" class="unset" slot="title">{film_title(number)}</a>'
+            f'</search-page-media-row></ul></search-page-result></body></html>'
+        )
+    number = film_number(path)
+    scorecard = {"criticsScore": {"score": str(number % 101)}, "audienceScore": {"score": str((number * 7) % 101)} if number % 9 else {}}
+    return f'<html><body><script id="media-scorecard-json" type="application/json">{json.dumps(scorecard)}</script></body></html>'
+
+def oscars_response(path, query):
+    if path == "/awards":
+        # the bulk list the awards index is built from
+        return [
+            dict(nomination, imdb_id=film_imdb_id(number))
+            for number in range(0, 20000, 5)
+            for nomination in film_nominations(number)
+        ]
+    number = film_number(path.rsplit('/', 1)[1], IMDB_ID_OFFSET)
+    return film_nominations(number) if film_has_awards(number) else None
+
+def letterboxd_response(path, query):
+    parts = [unquote(part) for part in path.strip('/').split('/')]
+    if parts[:3] == ["s", "search", "films"]:
+        number = film_number(parts[3])
+        if number is None:
+            return "<html><body></body></html>"
+        return (
+            '<html><body><ul><li>'
+            f'<div class="react-component figure" data-item-slug="{film_slug(number)}" '
+            f'data-item-name="{film_title(number)} ({film_year(number)})" data-target-link="/film/{film_slug(number)}/"></div>'
+            f'<p class="film-metadata"><a href="/director/director-{number}/">Director {number}</a></p>'
+            '</li></ul></body></html>'
+        )
+    if parts[0] == "film":
+        number = film_number(parts[1])
+        script = {
+            "name": film_title(number),
+            "image": f"https://example.com/posters/{number}.jpg",
+            "releasedEvent": [{"startDate": str(film_year(number))}],
+            "aggregateRating": {"ratingValue": round(2 + number % 30 / 10, 2), "reviewCount": number * 3, "ratingCount": number * 11}
+        }
+        cast = ''.join(f'<a class="text-slug tooltip" href="/actor/actor-{number}-{c}/" title="Role {c}">Actor {number} {c}</a>' for c in "ABC")
+        return (
+            '<html><head><meta property="og:type" content="video.movie">'
+            f'<script type="application/ld+json">/* <![CDATA[ */{json.dumps(script)}/* ]]> */</script></head><body>'
+            f'<span class="block-flag-wrapper"><a data-report-url="/film/{film_slug(number)}/report/{number}/"></a></span>'
+            f'<h1 class="primaryname"><span class="name">{film_title(number)}</span></h1>'
+            f'<p class="text-footer">{80 + number % 60}&nbsp;mins</p>'
+            f'<a data-track-action="TMDB" href="https://www.themoviedb.org/{"tv" if film_is_tv(number) else "movie"}/{TMDB_ID_OFFSET + number}/">TMDB</a>'
+            f'<a data-track-action="IMDb" href="http://www.imdb.com/title/{film_imdb_id(number)}/maindetails">IMDb</a>'
+            f'<div id="tab-panel-cast">{cast}</div>'
+            f'<div id="tab-panel-crew"><a href="/director/director-{number}/">Director {number}</a></div>'
+            '</body></html>'
+        )
+    # a user's films pages: the benchmark's saved ratings are up to date so there is nothing new
+    return "<html><body></body></html>"
+
+RESPONDERS = {
+    "tmdb": tmdb_response,
+    "imdb": imdb_response,
+    "rotten_tomatoes": rotten_tomatoes_response,
+    "oscars": oscars_response,
+    "letterboxd": letterboxd_response,
+}
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body go out as separate writes, which Nagle's algorithm would hold back on a kept-alive connection
+    # until the client's delayed ACK (~40ms), so back to back requests to one site would time the stand-in, not the program
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        server = self.server
+        url = urlsplit(self.path)
+        source, _, path = url.path.lstrip('/').partition('/')
+        if source not in RESPONDERS:
+            self.send(404, b"", "text/plain")
+            return
+        server.count_request(source)
+        if server.latency:
+            time.sleep(server.random_uniform(0.5, 1.5) * server.latency)
+        if server.random_uniform(0, 1) < server.error_rates.get(source, 0):
+            self.send(503, b"Service Unavailable", "text/plain")
+            return
+        body = RESPONDERS[source]('/' + path, parse_qs(url.query))
+        if body is None:
+            self.send(404, b'{"error": "not found"}', "application/json")
+        elif isinstance(body, str):
+            self.send(200, body.encode('utf-8'), "text/html; charset=utf-8")
+        else:
+            self.send(200, json.dumps(body).encode('utf-8'), "application/json")
+
+    def send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, latency=0.0, error_rates=None, seed=0, port=0):
+        super().__init__(("127.0.0.1", port), StandInHandler)
+        self.latency = latency
+        self.error_rates = error_rates or {}
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.request_counts = {}
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def random_uniform(self, low, high):
+        with self.lock:
+            return self.random.uniform(low, high)
+
+    def count_request(self, source):
+        with self.lock:
+            self.request_counts[source] = self.request_counts.get(source, 0) + 1
+
+    def reset_counts(self):
+        with self.lock:
+            counts = self.request_counts
+            self.request_counts = {}
+        return counts
+
+def start_server(latency=0.0, error_rates=None, seed=0, port=0):
+    server = StandInServer(latency, error_rates, seed, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+class LetterboxdSession:
+    # stands in for letterboxdpy's curl_cffi session, which can't be pointed elsewhere through transport
+    def __init__(self):
+        self.session = requests.Session()
+
+    def get(self, url, impersonate=None, **kwargs):
+        return self.session.get(transport.rewrite_url(url), **kwargs)
+
+def point_sites_at(base_url):
+    # send every site's requests made in this process to the stand-in server at base_url
+    for source, site_url in SITE_URLS.items():
+        transport.url_rewrites[site_url] = f"{base_url}/{source}"
+    Scraper.set_instance(LetterboxdSession())
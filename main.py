@@ -1,6 +1,64 @@
-from src.get_movie_info import get_movie_info
+import argparse
+from src.get_movie_info import get_movie_info, merge_shards
+from src.response_cache import CACHE_MODES
+from src.shards import parse_shard
+from src.workbook_io import OUTPUT_FORMATS
+
+def parse_args(defaults):
+    # every setting below can be overridden on the command line, and the questions asked while running answered up front
+    # e.g. to split a full refresh over 4 processes or machines, run each of
+    #     python main.py --mode s --check-all --shards 4 --shard 0   (then --shard 1, 2 and 3)
+    # and once all have finished
+    #     python main.py --merge --shards 4
+    parser = argparse.ArgumentParser(description="Fill in movie details from TMDB, IMDb, Letterboxd and Rotten Tomatoes.")
+    parser.add_argument("--filename", default=defaults["filename"], help="spreadsheet in the input folder")
+    parser.add_argument("--username", default=defaults["letterboxd_username"], help="Letterboxd username")
+    parser.add_argument("--mode", choices=['u', 's'], help="'u' to update from saved progress, 's' to start from the spreadsheet (asked if not given)")
+    parser.add_argument("--check-all", dest="check_all", action='store_true', default=None, help="check every row for missing data")
+    parser.add_argument("--new-only", dest="check_all", action='store_false', help="only fill newly added rows")
+    parser.add_argument("--max-workers", type=int, default=defaults["max_workers"], help="movies enriched at once")
+    parser.add_argument("--cache-mode", choices=CACHE_MODES, default=defaults["cache_mode"])
+    parser.add_argument("--full-resync", action='store_true', default=defaults["letterboxd_full_resync"], help="re-download the whole Letterboxd film list")
+    parser.add_argument("--profiler", choices=['cprofile', 'pyinstrument'], default=defaults["profiler"])
+    parser.add_argument("--output-formats", nargs='*', choices=OUTPUT_FORMATS, default=defaults["output_formats"], help="extra output formats")
+    parser.add_argument("--refresh-budget", type=int, default=defaults["refresh_budget"], help="requests to spend refetching out of date ratings and scores")
+    parser.add_argument("--fuzzy-titles", action='store_true', default=defaults["fuzzy_title_matching"], help="match titles close to a known film's without searching")
+    parser.add_argument("--dry-run", action='store_true', help="print the lookups and requests the run would make, without fetching or saving anything")
+    parser.add_argument("--shards", type=int, help="number of shards the rows are split into")
+    parser.add_argument("--shard", type=int, help="which shard (0 to shards - 1) this run processes")
+    parser.add_argument("--merge", action='store_true', help="combine the output of every shard into the final workbook")
+    return parser.parse_args()
 
 if __name__ == "__main__":
     filename = "movies_database.xlsx"
     letterboxd_username = "DWynter10"
-    get_movie_info(filename, letterboxd_username)
+    # set above 1 to enrich several movies at once (per-site limits are in SITE_LIMITS in src/get_movie_info.py)
+    max_workers = 1
+    # 'use' reuses saved site responses, 'refresh' fetches everything again and saves it, 'bypass' ignores saved responses
+    cache_mode = 'use'
+    # only new or re-rated Letterboxd films are fetched each run; set to True to re-download your whole film list
+    letterboxd_full_resync = False
+    # set to 'cprofile' or 'pyinstrument' to profile the data retrieval loop (saved next to the output file)
+    profiler = None
+    # also save the output as 'csv' and/or 'parquet' (needs pyarrow) next to the Excel file, e.g. ['csv']
+    output_formats = []
+    # set to a number of requests to also refetch the most out of date ratings and scores each run, e.g. 500
+    refresh_budget = None
+    # set to True to also match rows to known films by close (not just the same) titles, e.g. 'Spiderman: Into the Spiderverse' to 'Spider-Man: Into the Spider-Verse'
+    fuzzy_title_matching = False
+    args = parse_args({
+        "filename": filename, "letterboxd_username": letterboxd_username, "max_workers": max_workers, "cache_mode": cache_mode,
+        "letterboxd_full_resync": letterboxd_full_resync, "profiler": profiler, "output_formats": output_formats,
+        "refresh_budget": refresh_budget, "fuzzy_title_matching": fuzzy_title_matching
+    })
+    if args.merge:
+        if args.shards is None:
+            raise ValueError("Error: --merge needs --shards to know how many shards to combine.")
+        merge_shards(args.filename, args.shards, args.output_formats)
+    else:
+        shard = parse_shard(args.shard, args.shards)
+        get_movie_info(
+            args.filename, args.username, args.max_workers, cache_mode=args.cache_mode, letterboxd_full_resync=args.full_resync,
+            profiler=args.profiler, mode=args.mode, check_all=args.check_all, output_formats=args.output_formats, shard=shard,
+            refresh_budget=args.refresh_budget, fuzzy_title_matching=args.fuzzy_titles, dry_run=args.dry_run
+        )
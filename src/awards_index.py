@@ -0,0 +1,102 @@
+import json
+import os
+import pickle
+import time
+import requests
+from src import transport
+
+# Academy Awards nominations for every film, keyed by IMDb ID, loaded once and kept in src/tmp
+# built from AWARDS_DUMP_FILE if present, else from one bulk request to AWARDS_BULK_URL
+# https://github.com/mattgrosso/film-awards-api
+AWARDS_INDEX_FILE = "src/tmp/awards_index.pickle"
+AWARDS_DUMP_FILE = "input/awards_dump.json"
+AWARDS_BULK_URL = "https://web-production-b8145.up.railway.app/awards"
+AWARDS_INDEX_MAX_AGE = 7 * 24 * 60 * 60  # seconds, rebuilt after this so new ceremonies get picked up
+# fields a nomination record in the dump/bulk response may keep the film's IMDb ID under
+AWARDS_IMDB_ID_KEYS = ["imdb_id", "imdbId", "imdbID", "imdb"]
+
+class AwardsIndex:
+    def __init__(self, awards: dict, built_at: float):
+        self.awards = awards
+        self.built_at = built_at
+
+    def get(self, imdb_id):
+        # None means the film has no nominations
+        return self.awards.get(imdb_id)
+
+    def is_stale(self, dump_file=AWARDS_DUMP_FILE, max_age=AWARDS_INDEX_MAX_AGE):
+        if time.time() - self.built_at > max_age:
+            return True
+        # a dump file newer than the index replaces it
+        return os.path.exists(dump_file) and os.path.getmtime(dump_file) > self.built_at
+
+def nomination_imdb_id(nomination):
+    for key in AWARDS_IMDB_ID_KEYS:
+        if nomination.get(key):
+            return nomination[key]
+    return None
+
+def group_nominations(awards_json):
+    # accepts either {imdb_id: [nominations]} or a flat list of nominations each carrying an IMDb ID
+    # raises ValueError if no nomination has an IMDb ID, as an empty index would report every film as never nominated
+    if isinstance(awards_json, dict):
+        awards = {imdb_id: list(nominations) for imdb_id, nominations in awards_json.items()}
+        if not awards:
+            raise ValueError("no nominations found")
+        return awards
+    awards = {}
+    for nomination in awards_json:
+        imdb_id = nomination_imdb_id(nomination)
+        if imdb_id is None:
+            continue
+        awards.setdefault(imdb_id, []).append({
+            "category": nomination["category"],
+            "names": nomination["names"],
+            "isWinner": nomination["isWinner"]
+        })
+    if not awards:
+        raise ValueError("no nomination has an IMDb ID")
+    return awards
+
+def load_awards_json(dump_file=AWARDS_DUMP_FILE, bulk_url=AWARDS_BULK_URL):
+    if os.path.exists(dump_file):
+        with open(dump_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    response = transport.get("oscars", bulk_url, timeout=60)
+    response.raise_for_status()
+    return response.json()
+
+def build_awards_index(index_file=AWARDS_INDEX_FILE, dump_file=AWARDS_DUMP_FILE, bulk_url=AWARDS_BULK_URL):
+    index = AwardsIndex(group_nominations(load_awards_json(dump_file, bulk_url)), time.time())
+    os.makedirs(os.path.dirname(index_file) or '.', exist_ok=True)
+    tmp_file = f"{index_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'wb') as f:
+        pickle.dump({"built_at": index.built_at, "awards": index.awards}, f)
+    os.replace(tmp_file, index_file)
+    return index
+
+def load_awards_index(index_file=AWARDS_INDEX_FILE, dump_file=AWARDS_DUMP_FILE, bulk_url=AWARDS_BULK_URL, rebuild=True):
+    # returns the saved index, rebuilding it first if missing or stale
+    # if it can't be rebuilt, a stale index is still used, and with no index at all None is returned
+    # rebuild=False only loads the saved index, stale or not, e.g. for a dry run
+    index = None
+    if os.path.exists(index_file):
+        with open(index_file, 'rb') as f:
+            saved = pickle.load(f)
+        index = AwardsIndex(saved["awards"], saved["built_at"])
+    if rebuild and (index is None or index.is_stale(dump_file)):
+        try:
+            index = build_awards_index(index_file, dump_file, bulk_url)
+        except (requests.RequestException, transport.SiteUnavailable, ValueError, KeyError, TypeError) as e:
+            print(f"Error: Could not build Academy Awards index ({e}), {'using saved index' if index else 'looking up awards per film'}.")
+    return index
+
+awards_index = None
+
+def setup_awards_index(**kwargs):
+    global awards_index
+    awards_index = load_awards_index(**kwargs)
+    return awards_index
+
+def get_awards_index():
+    return awards_index
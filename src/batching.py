@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import Future
+
+class BatchLoader:
+    # gathers keys asked for by concurrent callers into batch calls of up to max_batch_size keys
+    # a batch is sent once full or max_wait seconds after the first key, by whichever caller asked first
+    # fetch_batch(keys) returns {key: value} (a missing key gives None), or raises for the whole batch
+    # a key already waiting or being fetched isn't added again, its callers share the one result
+    def __init__(self, fetch_batch, max_batch_size, max_wait):
+        self.fetch_batch = fetch_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = []
+        self.futures = {}
+        self.dispatching = False
+        self.batch_ready = threading.Condition()
+
+    def load(self, key):
+        with self.batch_ready:
+            future = self.futures.get(key)
+            if future is None:
+                future = self.futures[key] = Future()
+                self.pending.append(key)
+                if len(self.pending) >= self.max_batch_size:
+                    self.batch_ready.notify()
+            dispatcher = not self.dispatching
+            self.dispatching = True
+        if dispatcher:
+            self.dispatch()
+        return future.result()
+
+    def dispatch(self):
+        # sends batches until nothing is left waiting, so keys added while a batch is out aren't stranded
+        while True:
+            with self.batch_ready:
+                if not self.pending:
+                    self.dispatching = False
+                    return
+                self.batch_ready.wait_for(lambda: len(self.pending) >= self.max_batch_size, self.max_wait)
+                batch = self.pending[:self.max_batch_size]
+                self.pending = self.pending[self.max_batch_size:]
+            self.send(batch)
+
+    def send(self, batch):
+        error = None
+        try:
+            results = self.fetch_batch(batch)
+        except Exception as e:
+            results, error = {}, e
+        with self.batch_ready:
+            futures = {key: self.futures.pop(key) for key in batch}
+        for key, future in futures.items():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results.get(key))
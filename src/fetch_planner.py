@@ -0,0 +1,77 @@
+import math
+import pandas as pd
+from src.request_movie_site_data import IMDB_BATCH_SIZE
+
+# the fields each source fills in, a row needs that source looked up while any of them is missing
+SOURCE_FIELDS = {
+    "tmdb": [
+        'Director', 'Runtime (minutes)', 'Budget', 'Box Office', 'Country of Origin',
+        'Spoken Languages', 'Classification', 'IMDb ID'
+    ],
+    "imdb": ['IMDb Rating', 'Metascore', 'Poster URL'],
+    "oscars": ["Academy Award Nominations", 'Academy Award Wins', 'Academy Award Details'],
+    "rotten_tomatoes": ['Tomatometer (Critic Score)', 'Popcornmeter (Audience Score)'],
+    "letterboxd": [
+        'Letterboxd Average Rating', 'Letterboxd My Rating', 'Letterboxd Review Count',
+        'Letterboxd Rating Count', 'Cast (from Letterboxd)', 'Runtime (from Letterboxd)',
+        'TMDB ID (from Letterboxd)', 'IMDb ID (from Letterboxd)', 'Letterboxd Slug'
+    ],
+}
+# sources are looked up over a batch of rows one source at a time, in chains that run side by side
+# IMDb and awards lookups need the IMDb ID TMDB fills in, so follow it; Rotten Tomatoes and Letterboxd need nothing
+# from the others (their results are only added to a row once all its lookups are done), so go in chains of their own
+FETCH_CHAINS = [["tmdb", "imdb", "oscars"], ["rotten_tomatoes"], ["letterboxd"]]
+FETCH_ORDER = [source for chain in FETCH_CHAINS for source in chain]
+# most requests each lookup makes, before saved responses and the local title index cut them down
+# TMDB and Letterboxd also search for a film without an ID or slug, and awards are free with the local index
+SOURCE_REQUESTS = {"tmdb": 1, "imdb": 1, "oscars": 1, "rotten_tomatoes": 2, "letterboxd": 1}
+ID_FIELDS = ['TMDB ID (from Letterboxd)', 'IMDb ID', 'IMDb ID (from Letterboxd)']
+
+def missing_any(frame, fields):
+    # as is_missing_info: True where a row lacks any of fields (rows hold None for blanks, which pandas reads as NA)
+    return frame[fields].isna().any(axis=1)
+
+def plan_frame(rows, indexes):
+    # the columns the plan reads, for the rows at indexes (indexed by them)
+    columns = list(dict.fromkeys([field for fields in SOURCE_FIELDS.values() for field in fields] + ID_FIELDS))
+    index = pd.Index(indexes, dtype='int64')
+    if not len(index):
+        # from_records can't build an index for no records, e.g. an update run with nothing new
+        return pd.DataFrame(columns=columns, index=index)
+    return pd.DataFrame.from_records([rows[i] for i in indexes], columns=columns, index=index)
+
+def build_fetch_plan(frame, refresh_for=None, refresh_only=()):
+    # a boolean DataFrame with frame's rows and one column per source, True where that lookup runs
+    # worked out in one pass over whole columns rather than row by row, so the run's work is known before it starts
+    # the lookups still check their own rules as they run, e.g. awards once TMDB has found the IMDb ID
+    # rows in refresh_only are only looked up on their refresh_for sources, so a refresh stays within its budget
+    # even where fields no site could fill in (e.g. a Classification TMDB doesn't have) are still missing
+    refresh_for = refresh_for or {}
+    refresh = pd.DataFrame(
+        [[source in refresh_for.get(index, ()) for source in FETCH_ORDER] for index in frame.index],
+        columns=FETCH_ORDER, index=frame.index, dtype=bool
+    )
+    imdb_id_known = frame['IMDb ID'].notna() | frame['IMDb ID (from Letterboxd)'].notna()
+    plan = pd.DataFrame(index=frame.index)
+    plan["tmdb"] = missing_any(frame, SOURCE_FIELDS["tmdb"])
+    plan["imdb"] = missing_any(frame, SOURCE_FIELDS["imdb"]) | refresh["imdb"]
+    # awards are only looked up with an IMDb ID, which TMDB may be about to find
+    plan["oscars"] = (missing_any(frame, SOURCE_FIELDS["oscars"]) | refresh["oscars"]) & (imdb_id_known | plan["tmdb"])
+    for source in ["rotten_tomatoes", "letterboxd"]:
+        plan[source] = missing_any(frame, SOURCE_FIELDS[source]) | refresh[source]
+    only_refreshed = frame.index.isin(list(refresh_only))
+    plan.loc[only_refreshed] = refresh.loc[only_refreshed, FETCH_ORDER]
+    return plan
+
+def estimate_requests(plan, frame, awards_index_loaded=False):
+    # {source: (lookups, most requests they make)} for the plan
+    lookups = {source: int(plan[source].sum()) for source in FETCH_ORDER}
+    requests = {source: count * SOURCE_REQUESTS[source] for source, count in lookups.items()}
+    requests["tmdb"] += int((plan["tmdb"] & frame['TMDB ID (from Letterboxd)'].isna()).sum())
+    requests["letterboxd"] += int((plan["letterboxd"] & frame['Letterboxd Slug'].isna()).sum())
+    # IMDb titles are fetched several to a request, for the rows that have or will get an IMDb ID
+    with_imdb_id = plan["imdb"] & (frame['IMDb ID'].notna() | frame['IMDb ID (from Letterboxd)'].notna() | plan["tmdb"])
+    requests["imdb"] = math.ceil(int(with_imdb_id.sum()) / IMDB_BATCH_SIZE)
+    if awards_index_loaded:
+        requests["oscars"] = 0
+    return {source: (lookups[source], requests[source]) for source in FETCH_ORDER}
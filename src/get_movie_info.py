@@ -1,58 +1,114 @@
-import pandas as pd
 import json
 import requests
 import math
+import time
+import contextlib
+import queue
+import threading
 from tqdm import tqdm
-from src.request_movie_site_data import setup_apis, search_tmdb, retrieve_tmdb_data, search_imdb, scrape_rotten_tomatoes, get_letterboxd_user_ratings, get_letterboxd_movie_data, get_oscars_data
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from src.request_movie_site_data import USER_RATINGS_FILE, IMDB_BATCH_WAIT, setup_imdb_batching, prefetch_imdb_titles, setup_apis, search_tmdb, retrieve_tmdb_data, search_imdb, scrape_rotten_tomatoes, get_letterboxd_user_ratings, get_letterboxd_movie_data, get_oscars_data
+from src.rate_limit import build_site_limiters
+from src.journal import Journal
+from src.movie_store import MovieStore
+from src.awards_index import get_awards_index
+from src import transport
+from src.transport import SiteUnavailable, check_available
+from src.response_cache import get_cache_stats, flush_cache
+from src.instrumentation import run_metrics, instrumented, profiled
+from src.workbook_io import read_input_rows, write_outputs, check_output_formats
+from src.shards import in_shard, shard_of, shard_filename
+from src.refresh_scheduler import build_refresh_queue
+from src.title_resolver import build_title_resolver
+from src.fetch_planner import SOURCE_FIELDS, FETCH_CHAINS, FETCH_ORDER, plan_frame, build_fetch_plan, estimate_requests
 
-def load_movie_data(filename):
+# limits per site when enriching concurrently: requests in flight at once and new requests started per second
+# each HTTP request counts, so a lookup that searches then fetches a page takes two; responses from the cache take none
+SITE_LIMITS = {
+    "tmdb": {"max_concurrent": 8, "requests_per_second": 20},
+    "letterboxd": {"max_concurrent": 4, "requests_per_second": 4},
+    "imdb": {"max_concurrent": 4, "requests_per_second": 5},
+    "rotten_tomatoes": {"max_concurrent": 2, "requests_per_second": 2},
+    "oscars": {"max_concurrent": 4, "requests_per_second": 5},
+}
+SITE_NAMES = {"tmdb": "TMDB", "letterboxd": "Letterboxd", "imdb": "IMDB", "rotten_tomatoes": "Rotten Tomatoes", "oscars": "Academy Awards"}
+SKIPPED = object()
+# rows fetched (and then saved) together, one source at a time
+FETCH_CHUNK_SIZE = 500
+
+def get_journal(filename, read_only=False):
+    return Journal("src/tmp/" + filename.replace(".xlsx", "_journal.jsonl"), read_only=read_only)
+
+def load_movie_data(filename, mode=None, shard=None, read_only=False):
+    # mode 'u' or 's' is asked for unless given
+    # with a shard only its rows are loaded, and its progress is kept in a journal of its own
+    # read_only leaves the saved progress as it is, e.g. for a dry run
+    if mode is not None and mode.lower() not in ['u', 's']:
+        raise ValueError(f"Error: mode must be 'u' or 's', not '{mode}'.")
     input_filename = "input/" + filename
+    journal = get_journal(shard_filename(filename, shard), read_only)
     while True:
-        mode = input("Do you want to update or start from beginning? Enter 'u' or 's': ")
+        if mode is None:
+            mode = input("Do you want to update or start from beginning? Enter 'u' or 's': ")
         if mode.lower() == 'u':
-            # open save file in tmp folder
-            try:
-                save_filename = "src/tmp/" + filename.replace(".xlsx", "_save_file.json")
-                with open(save_filename, 'r', encoding='utf-8') as file:
-                    movie_data = json.load(file)
-            except FileNotFoundError:
-                raise FileNotFoundError(f"Error: There is no save file for '{filename}'. Check the filename and rerun the program if save file exists, else select 's' to start from beginning and filename will be generated.")
+            # rebuild progress from the journal in tmp folder
+            if journal.exists():
+                with run_metrics.timer("io.load_movie_data"):
+                    movie_data, error_set = journal.replay()
+            else:
+                # older runs kept a full save file and errors file instead, start a journal from them
+                try:
+                    save_filename = "src/tmp/" + filename.replace(".xlsx", "_save_file.json")
+                    with open(save_filename, 'r', encoding='utf-8') as file:
+                        movie_data = json.load(file)
+                except FileNotFoundError:
+                    raise FileNotFoundError(f"Error: There is no save file for '{filename}'. Check the filename and rerun the program if save file exists, else select 's' to start from beginning and filename will be generated.")
+                try:
+                    with open("src/tmp/" + filename.replace(".xlsx", "_errors.txt"), 'r', encoding='utf-8') as f:
+                        error_set = set(v for v in f.read().split('\n') if v)
+                except FileNotFoundError:
+                    error_set = set()
+                movie_data = [row for row in movie_data if in_shard(row, shard)]
+                journal.compact(movie_data, error_set)
             break
         elif mode.lower() == 's':
             # get excel data to read and use for search
             try:
-                df = pd.read_excel(input_filename, header=0)
-                df = df.replace({float('nan'): None})
-                movie_data = df.to_dict('records')
-                
-                # if starting new, clear errors log
-                open('src/tmp/' + filename.replace(".xlsx", "_errors.txt"), 'w').close()
+                with run_metrics.timer("io.load_movie_data"):
+                    movie_data = read_input_rows(input_filename, "src/tmp/" + filename.replace(".xlsx", "_input_snapshot.pickle"), not read_only)
             except FileNotFoundError:
                 raise FileNotFoundError(f"Error: There is no file in 'input' folder called '{filename}'.\nCheck the filename and rerun the program.")
+            movie_data = [row for row in movie_data if in_shard(row, shard)]
+            # if starting new, journal starts from the spreadsheet with no errors or fetch times
+            error_set = set()
+            journal.compact(movie_data, error_set, [])
             break
-    return movie_data
-
-def save_progress(filename, error_save_folder, movie_data, error_set):
-    save_filename = "src/tmp/" + filename.replace(".xlsx", "_save_file.json")
-    err_filename = "src/tmp/" + filename.replace(".xlsx", "_errors.txt")
-    # save all entries
-    with open(save_filename, "w") as f:
-        json.dump(movie_data, f)
-    
-    # get errors and only save unique values
-    with open(err_filename, 'r', encoding='utf-8') as f:
-        err_file_text = f.read()
-        err_file_list = set(err_file_text.split('\n'))
-    error_set.update(err_file_list)
-    error_list = sorted([v for v in error_set if type(v) is str])
+        mode = None
+    return movie_data, error_set, journal, mode.lower()
+
+@instrumented("io.save_progress", count_empty=False)
+def save_progress(journal, movie_store, error_set, index, fields, errors, fetched_at=None):
+    # checkpoint a single row: only its changed fields, fetch times and new errors are appended to the journal
+    new_errors = [error for error in errors if error not in error_set]
+    error_set.update(new_errors)
+    journal.update_row(index, fields, fetched_at)
+    journal.add_errors(new_errors)
+    if journal.needs_compaction():
+        journal.compact(movie_store.all_rows(), error_set)
+
+def save_errors(filename, error_save_folder, error_set):
+    # only save unique values
+    error_list = sorted([v for v in error_set if type(v) is str and v])
     with open(error_save_folder + filename.replace(".xlsx", "_errors.txt"), 'w', encoding='utf-8') as f:
         errors = '\n'.join(error_list)
         f.write(errors)
 
-def load_new_letterboxd_entries(movie_data, letterboxd_user_ratings):
+def load_new_letterboxd_entries(movie_store, letterboxd_user_ratings, journal=None, shard=None):
     print("\nLoading in your missing logged movies from Letterboxd...")
-    available_slugs = [entry["Letterboxd Slug"] for entry in movie_data if 'Letterboxd Slug' in entry]
-    missing_films = {slug: v for slug,v in letterboxd_user_ratings["movies"].items() if slug not in available_slugs}
+    missing_films = {
+        slug: v for slug,v in letterboxd_user_ratings["movies"].items()
+        if not movie_store.has_slug(slug) and in_shard({"Movie Title": v["name"], "Year": v["year"]}, shard)
+    }
     for film in missing_films:
         entry = {}
         entry["Movie Title"] = missing_films[film]["name"]
@@ -63,106 +119,163 @@ def load_new_letterboxd_entries(movie_data, letterboxd_user_ratings):
         entry["Medium"] = None
         entry["Logged on Letterboxd"] = "Yes"
         entry["Decade"] = str(math.floor(entry["Year"] / 10) * 10) + 's'
-        movie_data.append(entry)
+        # a row for the same film without a slug yet gets filled in rather than duplicated
+        index, filled_fields = movie_store.merge(entry)
+        if journal is not None:
+            if filled_fields is None:
+                journal.append_row(entry)
+            else:
+                journal.update_row(index, filled_fields)
     print(f"You've watched {len(missing_films)} new properties since last upload: {', '.join([v['name'] for v in missing_films.values()])}\n")
-    return movie_data
-
-def get_movie_info(filename, letterboxd_username):
-    tmdb = setup_apis()
-    movie_data = load_movie_data(filename)
-    skip_checked_entries_input = input("Input 'c' to check all entries for missing data, else press Enter to skip to newly added rows: ")
-    skip_checked_entries = False if skip_checked_entries_input == 'c' else True
-    letterboxd_user_ratings = get_letterboxd_user_ratings(letterboxd_username)
-    movie_data = load_new_letterboxd_entries(movie_data, letterboxd_user_ratings)
-    error_set = set()
-    
-    i = 0
-    # search and retrieve movies
-    for movie_dict in tqdm(movie_data):
-        
-        def field_exists_and_valid(fieldname):
-            return fieldname in movie_dict and movie_dict[fieldname] is not None
-        
-        def is_missing_info(fields:list):
-            any_none_fields = any(movie_dict.get(key) is None for key in fields if key in movie_dict)
-            missing_fields = not all(key in movie_dict for key in fields)
-            return missing_fields or any_none_fields
+    update_letterboxd_ratings(movie_store, letterboxd_user_ratings, journal)
+    return movie_store
 
-        # if title or year missing, skip entry entirely
-        if is_missing_info(['Movie Title', 'Year']):
-            error_set.add(f"Error: Entry needs both title and year to attempt data retrieval - {movie_dict})!")
-            continue
-        
-        title = movie_dict['Movie Title']
-        year = movie_dict['Year']
-        new_data = {}
-        tmdb_id = ""
-        
-        # Letterboxd is most reliable site for getting info, best one to skip on
-        # runtime is not pulled for new entries from Letterboxd, so will pick up those too
-        if not is_missing_info(['Runtime (from Letterboxd)']) and skip_checked_entries:
-            continue
-        
-        site_fields = [
-            'Director', 'Runtime (minutes)', 'Budget', 'Box Office', 'Country of Origin', 
-            'Spoken Languages', 'Classification', 'IMDb ID'
-        ]
-        # get TMDB data
-        if is_missing_info(site_fields):
+def update_letterboxd_ratings(movie_store, letterboxd_user_ratings, journal=None):
+    # rows already rated take the rating from the sync if it has changed, as rows already checked aren't looked up again
+    # rows without a rating yet get theirs from the Letterboxd lookup, as new ones do
+    rerated = []
+    for slug, film in letterboxd_user_ratings["movies"].items():
+        my_rating = film["rating"]/2 if film["rating"] is not None else "Not Rated"
+        for index in movie_store.find_all_by_slug(slug):
+            if movie_store[index].get("Letterboxd My Rating") not in [None, my_rating]:
+                movie_store.update(index, {"Letterboxd My Rating": my_rating})
+                if journal is not None:
+                    journal.update_row(index, {"Letterboxd My Rating": my_rating})
+                rerated.append(film["name"])
+    if rerated:
+        print(f"You've re-rated {len(rerated)} properties since last upload: {', '.join(rerated)}\n")
+
+def fill_from_duplicate(movie_dict, enriched_movie_dict):
+    # a duplicate row takes whatever the enriched row found that it is still missing
+    movie_dict = dict(movie_dict)
+    for k, v in enriched_movie_dict.items():
+        if movie_dict.get(k) is None and v is not None:
+            movie_dict[k] = v
+    return movie_dict
+
+def is_missing_info(movie_dict, fields:list):
+    any_none_fields = any(movie_dict.get(key) is None for key in fields if key in movie_dict)
+    missing_fields = not all(key in movie_dict for key in fields)
+    return missing_fields or any_none_fields
+
+def prepare_enrichment(movie_dict, letterboxd_user_ratings, refresh_sources=(), title_resolver=None, refresh_only=False):
+    # returns (lookups, known_imdb_id, finish): lookups maps each source in FETCH_ORDER to a function looking this movie up on it,
+    # known_imdb_id() gives the IMDb ID found so far, and finish() the enriched copy, errors, and the fields a site answered for (changed or not)
+    # TMDB and IMDb write into the copy as they go, the rest of the results are only added by finish(),
+    # so Rotten Tomatoes and Letterboxd may run alongside them and see the row as it was
+    # works on a copy so rows held by the movie store are never mutated mid-save
+    # sites in refresh_sources are looked up again even if their fields are filled in, and with refresh_only only they are
+    # rows without a Letterboxd slug or TMDB ID take them from title_resolver where it knows the film, instead of searching
+    movie_dict = dict(movie_dict)
+    title = movie_dict['Movie Title']
+    year = movie_dict['Year']
+    errors = []
+    fetched_fields = set()
+    results = {}
+
+    def field_exists_and_valid(fieldname):
+        return fieldname in movie_dict and movie_dict[fieldname] is not None
+
+    def needs_lookup(site):
+        if refresh_only:
+            return site in refresh_sources
+        return site in refresh_sources or is_missing_info(movie_dict, SOURCE_FIELDS[site])
+
+    def call_site(site, function, *args, uses_network=True):
+        # while a site's circuit breaker is open the call is skipped (and logged) without waiting on its rate limit
+        # the site's rate limit is waited on by each request the lookup sends (see transport), not by the lookup
+        if not uses_network:
+            return function(*args)
+        try:
+            check_available(site)
+            return function(*args)
+        except SiteUnavailable:
+            errors.append(f"Error: {SITE_NAMES[site]} - Skipped {title} ({year}), site unavailable!")
+            return SKIPPED
+
+    def known_imdb_id():
+        return movie_dict['IMDb ID'] if field_exists_and_valid('IMDb ID') else movie_dict['IMDb ID (from Letterboxd)'] if field_exists_and_valid('IMDb ID (from Letterboxd)') else None
+
+    def get_imdb_data():
+        if needs_lookup('imdb'):
+            # IMDb lookups are batched across movies
+            imdb_data = call_site('imdb', search_imdb, movie_dict)
+            if imdb_data is SKIPPED:
+                return
+            if not imdb_data:
+                errors.append(f"Error: IMDB - No info found for {title} ({year})!")
+            else:
+                movie_dict.update(imdb_data)
+                fetched_fields.update(imdb_data)
+
+    def get_awards_data():
+        # https://github.com/mattgrosso/film-awards-api
+        imdb_id = known_imdb_id()
+        if imdb_id is not None and needs_lookup('oscars'):
+            # lookups in the local awards index don't touch the network so aren't rate limited
+            oscars_data = call_site('oscars', get_oscars_data, imdb_id, year, uses_network=get_awards_index() is None)
+            if oscars_data is SKIPPED:
+                return
+            if not oscars_data:
+                errors.append(f"Error: Academy Awards - No info found for {title} ({year})!")
+            else:
+                fetched_fields.update(oscars_data)
+                results['oscars'] = oscars_data
+
+    def get_tmdb_data():
+        if needs_lookup('tmdb'):
             medium = movie_dict['Medium'] if field_exists_and_valid('Medium') else None
             # get TMDB ID
+            imdb_id = known_imdb_id()
             if field_exists_and_valid('TMDB ID (from Letterboxd)'):
                 tmdb_id = movie_dict['TMDB ID (from Letterboxd)']
             else:
-                tmdb_id = search_tmdb(title, year, medium)
+                # an IMDb ID finds exactly one TMDB entry, so the title index is only used without one
+                tmdb_id = title_resolver.resolve_tmdb_id(title, year, medium) if title_resolver is not None and imdb_id is None else None
+                if tmdb_id is None:
+                    tmdb_id = call_site('tmdb', search_tmdb, title, year, medium, imdb_id)
             # retrieve data from TMDB
-            if tmdb_id:
-                movie_dict = retrieve_tmdb_data(movie_dict, tmdb_id, medium)
+            if tmdb_id is SKIPPED:
+                pass
+            elif tmdb_id:
+                # filled into a dict of its own (with the Franchise it may keep) to see which fields TMDB answered for
+                tmdb_data = {k: movie_dict[k] for k in ['Franchise'] if k in movie_dict}
+                call_site('tmdb', retrieve_tmdb_data, tmdb_data, tmdb_id, medium)
+                fetched_fields.update(k for k in tmdb_data if k != 'Franchise')
+                movie_dict.update(tmdb_data)
             else:
-                error_set.add(f"Error: TMDB - No info found for {title} ({year})!")
+                errors.append(f"Error: TMDB - No info found for {title} ({year})!")
 
-        # get Letterboxd data
-        site_fields = [
-            'Letterboxd Average Rating', 'Letterboxd My Rating', 'Letterboxd Review Count', 
-            'Letterboxd Rating Count', 'Cast (from Letterboxd)', 'Runtime (from Letterboxd)', 
-            'TMDB ID (from Letterboxd)', 'IMDb ID (from Letterboxd)', 'Letterboxd Slug'
-        ]
-        if is_missing_info(site_fields):
+    def get_letterboxd_data():
+        # Letterboxd is most reliable site for getting info
+        if needs_lookup('letterboxd'):
             slug = movie_dict["Letterboxd Slug"] if 'Letterboxd Slug' in movie_dict else None
-            letterboxd_data = get_letterboxd_movie_data(title, year, letterboxd_user_ratings, slug)
+            if slug is None and title_resolver is not None:
+                slug = title_resolver.resolve_slug(title, year)
+            letterboxd_data = call_site('letterboxd', get_letterboxd_movie_data, title, year, letterboxd_user_ratings, slug)
+            if letterboxd_data is SKIPPED:
+                return
             if not letterboxd_data:
-                error_set.add(f"Error: Letterboxd - No info found for {title} ({year})!")
-            new_data.update(letterboxd_data)
-        
-        # get IMDb data
-        site_fields = ['IMDb Rating', 'Metascore', 'Poster URL']
-        if is_missing_info(site_fields):
-            imdb_data = search_imdb(movie_dict)
-            if not imdb_data:
-                error_set.add(f"Error: IMDB - No info found for {title} ({year})!")
-            else:
-                movie_dict.update(imdb_data)
-        
-        # get Rotten Tomatoes data
-        site_fields = ['Tomatometer (Critic Score)', 'Popcornmeter (Audience Score)']
-        if is_missing_info(site_fields):
+                errors.append(f"Error: Letterboxd - No info found for {title} ({year})!")
+            fetched_fields.update(letterboxd_data)
+            results['letterboxd'] = letterboxd_data
+
+    def get_rotten_tomatoes_data():
+        if needs_lookup('rotten_tomatoes'):
             full_cast = movie_dict['Cast (from Letterboxd)'].split(', ') if 'Cast (from Letterboxd)' in movie_dict and movie_dict['Cast (from Letterboxd)'] is not None else []
-            rt_data = scrape_rotten_tomatoes(title, year, movie_dict['Medium'], full_cast)
+            rt_data = call_site('rotten_tomatoes', scrape_rotten_tomatoes, title, year, movie_dict['Medium'], full_cast)
+            if rt_data is SKIPPED:
+                return
             if not rt_data:
-                error_set.add(f"Error: Rotten Tomatoes - No info found for {title} ({year})!")
-            new_data.update(rt_data)
-        
-        # Get Awards data
-        # https://github.com/mattgrosso/film-awards-api
-        imdb_id = movie_dict['IMDb ID'] if field_exists_and_valid('IMDb ID') else movie_dict['IMDb ID (from Letterboxd)'] if field_exists_and_valid('IMDb ID (from Letterboxd)') else None
-        if imdb_id is not None:
-            site_fields = ["Academy Award Nominations", 'Academy Award Wins', 'Academy Award Details']
-            if is_missing_info(site_fields):
-                oscars_data = get_oscars_data(imdb_id, year)
-                if not oscars_data:
-                    error_set.add(f"Error: Academy Awards - No info found for {title} ({year})!")
-                else:
-                    new_data.update(oscars_data)
+                errors.append(f"Error: Rotten Tomatoes - No info found for {title} ({year})!")
+            fetched_fields.update(rt_data)
+            results['rotten_tomatoes'] = rt_data
+
+    def finish():
+        new_data = {}
+        new_data.update(results.get('letterboxd', {}))
+        new_data.update(results.get('rotten_tomatoes', {}))
+        new_data.update(results.get('oscars', {}))
 
         # add all the details, then ratings, then cast and poster url
         priority_fields = [
@@ -172,23 +285,235 @@ def get_movie_info(filename, letterboxd_username):
             'Letterboxd Average Rating', 'Letterboxd My Rating', 'Academy Award Nominations',
             'Academy Award Wins', 'Academy Award Details'
         ]
-        if new_data:
-            i += 1
-        
         for k in list(new_data.keys()):
             if k in priority_fields:
                 movie_dict[k] = new_data.pop(k)
         movie_dict.update(new_data)
 
-        # save function
-        if i == 6:
-            save_progress(filename, "src/tmp/", movie_data, error_set)
-            i = 0
+        return movie_dict, errors, fetched_fields
 
-    save_progress(filename, "output/output-", movie_data, error_set)
-    output_df = pd.DataFrame(movie_data)
-    
-    output_filename = "output/output-" + filename
-    output_df.to_excel(output_filename, index=False)
+    lookups = {
+        "tmdb": get_tmdb_data, "imdb": get_imdb_data, "oscars": get_awards_data,
+        "rotten_tomatoes": get_rotten_tomatoes_data, "letterboxd": get_letterboxd_data
+    }
+    return lookups, known_imdb_id, finish
+
+def run_fetch_chain(chain, indexes_for, enrichments, progress, lookup_done, pool=None):
+    # runs each source of chain in turn over every row planned for it (indexes_for[source]), side by side when a pool is given
+    # lookup_done(index) is called as each of a row's lookups finishes
+    for source in chain:
+        indexes = indexes_for[source]
+        if source == "imdb":
+            # TMDB has found every IMDb ID it is going to by now, so their titles are fetched in full batches up front
+            prefetch_imdb_titles(enrichments[index][1]() for index in indexes)
+        if pool is None:
+            for index in indexes:
+                enrichments[index][0][source]()
+                progress.update()
+                lookup_done(index)
+        else:
+            futures = {pool.submit(enrichments[index][0][source]): index for index in indexes}
+            for future in as_completed(futures):
+                future.result()
+                progress.update()
+                lookup_done(futures[future])
+
+def run_fetch_chains(chunk_plan, enrichments, progress, store, pools, chain_pool=None):
+    # runs every chain of sources over the chunk's rows, side by side when a chain_pool is given
+    # each row is stored (store(index, result)) by the calling thread as soon as its last planned lookup is done
+    indexes_for = {source: chunk_plan.index[chunk_plan[source]].tolist() for source in FETCH_ORDER}
+    remaining = {index: int(count) for index, count in chunk_plan.sum(axis=1).items()}
+    remaining_lock = threading.Lock()
+    finished = queue.Queue()
+
+    def lookup_done(index):
+        with remaining_lock:
+            remaining[index] -= 1
+            if remaining[index]:
+                return
+        finished.put(index)
+
+    def store_finished():
+        while not finished.empty():
+            index = finished.get()
+            store(index, enrichments[index][2]())
+
+    for index, count in remaining.items():
+        if not count:
+            finished.put(index)
+    store_finished()
+    if chain_pool is None:
+        def lookup_done_and_store(index):
+            lookup_done(index)
+            store_finished()
+        for chain in FETCH_CHAINS:
+            run_fetch_chain(chain, indexes_for, enrichments, progress, lookup_done_and_store)
+        return
+    futures = [
+        chain_pool.submit(run_fetch_chain, chain, indexes_for, enrichments, progress, lookup_done, pool)
+        for chain, pool in zip(FETCH_CHAINS, pools)
+    ]
+    # a None in the queue marks a chain as done, after every row it finished
+    for future in futures:
+        future.add_done_callback(lambda _: finished.put(None))
+    chains_running = len(futures)
+    while chains_running:
+        index = finished.get()
+        if index is None:
+            chains_running -= 1
+        else:
+            store(index, enrichments[index][2]())
+    for future in futures:
+        future.result()
+
+def print_fetch_plan(fetch_plan, estimates):
+    print(f"\nLooking up {len(fetch_plan)} films (requests are at most, saved responses and known titles cut them down):")
+    for source, (lookups, num_requests) in estimates.items():
+        print(f"  {SITE_NAMES[source]:<16}{lookups:>8} lookups{num_requests:>8} requests")
+
+def get_movie_info(filename, letterboxd_username, max_workers=1, site_limits=None, cache_mode='use', letterboxd_full_resync=False, profiler=None, mode=None, check_all=None, output_formats=None, shard=None, refresh_budget=None, fuzzy_title_matching=False, dry_run=False):
+    # mode ('u'/'s') and check_all are asked for when not given, pass both to run without prompts
+    # refresh_budget (a number of requests) also refetches the most out of date ratings and scores, see src/refresh_scheduler.py
+    # output_formats adds copies of the output in any of OUTPUT_FORMATS ('csv', 'parquet') next to the Excel file
+    # shard (index, count) processes just that part of the rows, saving under its own names for merge_shards to combine
+    # fuzzy_title_matching lets titles close to (not just the same as) a known film's take its slug and TMDB ID, see src/title_resolver.py
+    # dry_run prints the lookups and requests the run would make and returns that plan, without fetching or saving anything
+    # (it goes by the Letterboxd ratings and awards index saved by the last run, so films logged since aren't counted)
+    check_output_formats(output_formats)
+    run_filename = shard_filename(filename, shard)
+    run_metrics.reset()
+    transport.set_site_limiters(build_site_limiters(site_limits or SITE_LIMITS))
+    tmdb = setup_apis(cache_mode, dry_run)
+    movie_data, error_set, journal, mode = load_movie_data(filename, mode, shard, dry_run)
+    movie_store = MovieStore(movie_data)
+    if check_all is None:
+        check_all = input("Input 'c' to check all entries for missing data, else press Enter to skip to newly added rows: ") == 'c'
+    skip_checked_entries = not check_all
+    # each shard keeps its own copy of the ratings, as what is new since the last sync differs per shard
+    letterboxd_user_ratings, changed_films = get_letterboxd_user_ratings(letterboxd_username, letterboxd_full_resync, shard_filename(USER_RATINGS_FILE, shard), dry_run)
+    # an updated save already has every film from earlier syncs, a fresh start from the spreadsheet may not
+    new_letterboxd_films = {"movies": changed_films} if mode == 'u' else letterboxd_user_ratings
+    movie_store = load_new_letterboxd_entries(movie_store, new_letterboxd_films, journal, shard)
+
+    # pick out the rows that need data retrieval
+    # rows for the same film are only looked up once, the rest are filled in from that lookup
+    pending = []
+    duplicates = {}
+    first_index_for = {}
+    refresh_candidates = []
+    for index, movie_dict in enumerate(movie_store):
+        # if title or year missing, skip entry entirely
+        if is_missing_info(movie_dict, ['Movie Title', 'Year']):
+            save_progress(journal, movie_store, error_set, index, {}, [f"Error: Entry needs both title and year to attempt data retrieval - {movie_dict})!"])
+            continue
+        # Letterboxd is most reliable site for getting info, best one to skip on
+        # runtime is not pulled for new entries from Letterboxd, so will pick up those too
+        if not is_missing_info(movie_dict, ['Runtime (from Letterboxd)']) and skip_checked_entries:
+            refresh_candidates.append(index)
+            continue
+        identity = movie_store.identity(movie_dict)
+        if identity in first_index_for:
+            duplicates.setdefault(first_index_for[identity], []).append(index)
+            continue
+        first_index_for[identity] = index
+        pending.append(index)
+        refresh_candidates.append(index)
+
+    # rows with ratings or scores due a refresh are looked up again, most out of date first, within the budget
+    refresh_for = {}
+    # rows queued only for a refresh, which are looked up on nothing else
+    refresh_only = set()
+    if refresh_budget is not None:
+        refresh_queue = build_refresh_queue(movie_store, journal.fetched_at, refresh_budget, sorted(refresh_candidates), get_awards_index() is not None)
+        refresh_for = dict(refresh_queue)
+        pending_set = set(pending)
+        refresh_only = set(index for index, _ in refresh_queue if index not in pending_set)
+        pending.extend(index for index, _ in refresh_queue if index in refresh_only)
+        print(f"Refreshing {sum(len(sources) for sources in refresh_for.values())} out of date lookups over {len(refresh_for)} films (budget of {refresh_budget} requests)")
+
+    # which sources each row is looked up on, worked out before anything is fetched
+    with run_metrics.timer("io.plan_fetches"):
+        frame = plan_frame(movie_store, pending)
+        fetch_plan = build_fetch_plan(frame, refresh_for, refresh_only)
+    print_fetch_plan(fetch_plan, estimate_requests(fetch_plan, frame, get_awards_index() is not None))
+    if dry_run:
+        print("Dry run, nothing was fetched or saved.")
+        return fetch_plan
+
+    # slugs and TMDB IDs already known from logged films, filled in rows and saved searches, by title and year
+    with run_metrics.timer("io.build_title_index"):
+        title_resolver = build_title_resolver(letterboxd_user_ratings, movie_store, fuzzy_title_matching)
+
+    # IMDb titles are batched as TMDB finds their IDs, waiting briefly for other movies' IDs when enriching several at once
+    setup_imdb_batching(IMDB_BATCH_WAIT if max_workers > 1 else 0)
+
+    def store_result(index, result):
+        movie_dict, errors, fetched_fields = result
+        # enrichment only adds or overwrites keys, so replaying these on the old row rebuilds it in the same key order
+        old_movie_dict = movie_store[index]
+        changed_fields = {k: v for k, v in movie_dict.items() if k not in old_movie_dict or old_movie_dict[k] != v}
+        fetched_at = dict.fromkeys(sorted(fetched_fields), int(time.time()))
+        movie_store.replace(index, movie_dict)
+        title_resolver.add_row(movie_dict)
+        save_progress(journal, movie_store, error_set, index, changed_fields, errors, fetched_at)
+        for duplicate_index in duplicates.get(index, []):
+            # a duplicate only counts as fetched for the fields it took from this lookup
+            duplicate_dict = fill_from_duplicate(movie_store[duplicate_index], movie_dict)
+            store_result(duplicate_index, (duplicate_dict, errors, {k for k in fetched_fields if duplicate_dict.get(k) == movie_dict.get(k)}))
+
+    # search and retrieve movies, FETCH_CHUNK_SIZE rows at a time, one source at a time over them (see FETCH_CHAINS)
+    # each chain of sources runs side by side with the others, as does each lookup with max_workers above 1
+    # each row is saved as soon as all its lookups are done, so a crash loses at most the rows still being fetched
+    with profiled(profiler, "output/output-" + run_filename.replace(".xlsx", "_profile")), tqdm(total=int(fetch_plan.values.sum())) as progress:
+        with contextlib.ExitStack() as stack:
+            pools = [stack.enter_context(ThreadPoolExecutor(max_workers)) for _ in FETCH_CHAINS] if max_workers > 1 else [None] * len(FETCH_CHAINS)
+            chain_pool = stack.enter_context(ThreadPoolExecutor(len(FETCH_CHAINS))) if max_workers > 1 else None
+            for start in range(0, len(pending), FETCH_CHUNK_SIZE):
+                chunk_plan = fetch_plan.iloc[start:start + FETCH_CHUNK_SIZE]
+                enrichments = {
+                    index: prepare_enrichment(movie_store[index], letterboxd_user_ratings, refresh_for.get(index, ()), title_resolver, index in refresh_only)
+                    for index in chunk_plan.index.tolist()
+                }
+                run_fetch_chains(chunk_plan, enrichments, progress, store_result, pools, chain_pool)
+
+    with run_metrics.timer("io.compact_journal"):
+        journal.compact(movie_store.all_rows(), error_set)
+    save_errors(run_filename, "output/output-", error_set)
+    output_filename = "output/output-" + run_filename
+    with run_metrics.timer("io.write_output"):
+        output_filenames = write_outputs(output_filename, movie_store.all_rows(), output_formats)
     
-    print(f"All data saved to '{output_filename}'\nErrors saved to 'output/output-{filename.replace('.xlsx', '_errors.txt')}")
\ No newline at end of file
+    print(f"Matched {title_resolver.resolved['slug']} Letterboxd slugs and {title_resolver.resolved['tmdb_id']} TMDB IDs from saved data instead of searching")
+    report_filename = "output/output-" + run_filename.replace(".xlsx", "_run_report.json")
+    flush_cache()
+    run_metrics.write_report(report_filename, get_cache_stats())
+    print(f"All data saved to {', '.join(repr(f) for f in output_filenames)}\nErrors saved to 'output/output-{run_filename.replace('.xlsx', '_errors.txt')}'\nRun report saved to '{report_filename}'")
+
+def merge_shards(filename, num_shards, output_formats=None):
+    # combines the journals of every shard of filename into the one output workbook and errors log
+    # rows from the spreadsheet go back in its order, Letterboxd films added by the shards follow in shard order
+    check_output_formats(output_formats)
+    shard_rows = []
+    error_set = set()
+    for index in range(num_shards):
+        journal = get_journal(shard_filename(filename, (index, num_shards)))
+        if not journal.exists():
+            raise FileNotFoundError(f"Error: There is no journal for shard {index} of {num_shards} of '{filename}'. Run that shard before merging.")
+        rows, errors = journal.replay()
+        shard_rows.append(rows)
+        error_set.update(errors)
+    input_rows = read_input_rows("input/" + filename, "src/tmp/" + filename.replace(".xlsx", "_input_snapshot.pickle"))
+    next_position = [0] * num_shards
+    movie_data = []
+    for input_row in input_rows:
+        index = shard_of(input_row, num_shards)
+        if next_position[index] >= len(shard_rows[index]):
+            raise ValueError(f"Error: Shard {index} of {num_shards} has fewer rows than '{filename}' gives it. Rerun the shards with 's' if the spreadsheet has changed.")
+        movie_data.append(shard_rows[index][next_position[index]])
+        next_position[index] += 1
+    for index in range(num_shards):
+        movie_data.extend(shard_rows[index][next_position[index]:])
+
+    save_errors(filename, "output/output-", error_set)
+    output_filenames = write_outputs("output/output-" + filename, movie_data, output_formats)
+    print(f"Merged {num_shards} shards ({len(movie_data)} rows) into {', '.join(repr(f) for f in output_filenames)}\nErrors saved to 'output/output-{filename.replace('.xlsx', '_errors.txt')}'")
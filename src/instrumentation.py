@@ -0,0 +1,159 @@
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# upper bounds (seconds) of the latency histogram buckets, anything slower goes in the last one
+LATENCY_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    position = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[position]
+
+class RunMetrics:
+    # call counts, latencies, errors and empty results per operation, plus bytes downloaded per site
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.operations = {}
+            self.bytes_received = {}
+            self.started_at = time.time()
+
+    def record(self, name, seconds, error=False, empty=False):
+        with self.lock:
+            operation = self.operations.setdefault(name, {"calls": 0, "errors": 0, "empty": 0, "latencies": []})
+            operation["calls"] += 1
+            operation["errors"] += error
+            operation["empty"] += empty
+            operation["latencies"].append(seconds)
+
+    def add_bytes(self, site, num_bytes):
+        with self.lock:
+            self.bytes_received[site] = self.bytes_received.get(site, 0) + num_bytes
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, error=error)
+
+    def report(self, cache_stats=None):
+        with self.lock:
+            operations = {}
+            for name, operation in sorted(self.operations.items()):
+                latencies = sorted(operation["latencies"])
+                histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+                for latency in latencies:
+                    histogram[next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))] += 1
+                operations[name] = {
+                    "calls": operation["calls"],
+                    "errors": operation["errors"],
+                    "empty_results": operation["empty"],
+                    "error_rate": operation["errors"] / operation["calls"],
+                    "empty_rate": operation["empty"] / operation["calls"],
+                    "total_seconds": sum(latencies),
+                    "p50_seconds": percentile(latencies, 0.5),
+                    "p95_seconds": percentile(latencies, 0.95),
+                    "p99_seconds": percentile(latencies, 0.99),
+                    "max_seconds": latencies[-1],
+                    "histogram": {
+                        "bucket_upper_bounds_seconds": LATENCY_BUCKETS + [None],
+                        "counts": histogram
+                    }
+                }
+            return {
+                "started_at": self.started_at,
+                "wall_seconds": time.time() - self.started_at,
+                "operations": operations,
+                "bytes_received": dict(self.bytes_received),
+                "cache": cache_stats or {}
+            }
+
+    def write_report(self, report_filename, cache_stats=None):
+        report = self.report(cache_stats)
+        with open(report_filename, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(format_report(report))
+        return report
+
+def format_report(report):
+    lines = [f"\nRun took {report['wall_seconds']:.1f}s"]
+    lines.append(f"{'Operation':<38}{'Calls':>7}{'Errors':>8}{'Empty':>7}{'Total s':>9}{'p50 s':>8}{'p95 s':>8}{'p99 s':>8}")
+    for name, operation in report["operations"].items():
+        lines.append(
+            f"{name:<38}{operation['calls']:>7}{operation['errors']:>8}{operation['empty_results']:>7}"
+            f"{operation['total_seconds']:>9.2f}{operation['p50_seconds']:>8.3f}{operation['p95_seconds']:>8.3f}{operation['p99_seconds']:>8.3f}"
+        )
+    for site, num_bytes in sorted(report["bytes_received"].items()):
+        lines.append(f"Downloaded from {site}: {num_bytes / 1e6:.2f} MB")
+    for source, counts in report["cache"].items():
+        lines.append(f"Cache - {source}: {counts['hits']} hits, {counts['misses']} misses, {counts.get('coalesced', 0)} waited on an identical request")
+    return '\n'.join(lines)
+
+run_metrics = RunMetrics()
+
+def instrumented(name, count_empty=True):
+    # times every call of the decorated function; a falsy result counts as an empty result if count_empty
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            except Exception:
+                run_metrics.record(name, time.perf_counter() - start, error=True)
+                raise
+            run_metrics.record(name, time.perf_counter() - start, empty=count_empty and not result)
+            return result
+        return wrapper
+    return decorator
+
+@contextmanager
+def profiled(profiler, profile_filename):
+    # optional profiling of a block: 'cprofile', 'pyinstrument' (if installed) or None for no profiling
+    # both only see the calling thread, so profile with max_workers=1 to see time spent inside the lookups
+    if profiler is None:
+        yield
+    elif profiler == 'cprofile':
+        import cProfile
+        import pstats
+        profile = cProfile.Profile()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            profile.dump_stats(profile_filename + ".prof")
+            pstats.Stats(profile).sort_stats('cumulative').print_stats(20)
+            print(f"Profile saved to '{profile_filename}.prof'")
+    elif profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Error: pyinstrument is not installed ('pip install pyinstrument'), running without profiling.")
+            yield
+            return
+        profile = Profiler()
+        profile.start()
+        try:
+            yield
+        finally:
+            profile.stop()
+            with open(profile_filename + ".html", 'w', encoding='utf-8') as f:
+                f.write(profile.output_html())
+            print(profile.output_text())
+            print(f"Profile saved to '{profile_filename}.html'")
+    else:
+        raise ValueError(f"Error: profiler must be 'cprofile', 'pyinstrument' or None, not '{profiler}'.")
@@ -0,0 +1,103 @@
+import json
+import os
+
+class Journal:
+    # append-only record of movie_data changes, one JSON object per line:
+    #   {"op": "base", "rows": [...], "errors": [...], "fetched_at": [...]}   full snapshot, always the first line
+    #   {"op": "append", "row": {...}}                                         new row added to the end of movie_data
+    #   {"op": "update", "index": 3, "fields": {...}, "fetched_at": {...}}     fields changed on an existing row
+    #   {"op": "errors", "errors": [...]}                                      new errors logged
+    # fetched_at keeps, per row, the unix time each field was last fetched from its site (even if unchanged)
+    # every record is flushed to disk as it is written, so a crash loses at most the line being written
+    # a read_only journal keeps track of changes in memory only and never writes to disk
+    def __init__(self, path, compact_every=500, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        self.compact_every = compact_every
+        self.records_since_compaction = 0
+        self.file = None
+        self.fetched_at = []
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def replay(self):
+        movie_data = []
+        error_set = set()
+        with open(self.path, 'rb') as f:
+            content = f.read()
+        # a half-written last line from a crash has no newline yet; cut it off so new records start on a clean line
+        complete_end = content.rfind(b'\n') + 1
+        if complete_end < len(content) and not self.read_only:
+            with open(self.path, 'r+b') as f:
+                f.truncate(complete_end)
+        for line in content[:complete_end].decode('utf-8').split('\n'):
+            if not line:
+                continue
+            record = json.loads(line)
+            if record["op"] == "base":
+                movie_data = record["rows"]
+                error_set = set(record["errors"])
+                # journals from before fetch times were kept have none
+                self.fetched_at = record.get("fetched_at") or [{} for _ in movie_data]
+            elif record["op"] == "append":
+                movie_data.append(record["row"])
+                self.fetched_at.append({})
+            elif record["op"] == "update":
+                movie_data[record["index"]].update(record["fields"])
+                self.fetched_at[record["index"]].update(record.get("fetched_at", {}))
+            elif record["op"] == "errors":
+                error_set.update(record["errors"])
+            self.records_since_compaction += 1
+        return movie_data, error_set
+
+    def compact(self, movie_data, error_set, fetched_at=None):
+        # write a fresh snapshot next to the journal, then swap it in so the old journal stays intact until then
+        # fetched_at replaces the fetch times kept so far, e.g. with none when starting again from the spreadsheet
+        self.close()
+        if fetched_at is not None:
+            self.fetched_at = fetched_at
+        self.fetched_at = self.fetched_at[:len(movie_data)] + [{} for _ in range(len(movie_data) - len(self.fetched_at))]
+        if self.read_only:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"op": "base", "rows": movie_data, "errors": sorted(error_set), "fetched_at": self.fetched_at}, f)
+            f.write('\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.records_since_compaction = 0
+
+    def needs_compaction(self):
+        return self.records_since_compaction >= self.compact_every
+
+    def append_row(self, row):
+        self.fetched_at.append({})
+        self._write({"op": "append", "row": row})
+
+    def update_row(self, index, fields, fetched_at=None):
+        if fetched_at:
+            self.fetched_at[index].update(fetched_at)
+            self._write({"op": "update", "index": index, "fields": fields, "fetched_at": fetched_at})
+        elif fields:
+            self._write({"op": "update", "index": index, "fields": fields})
+
+    def add_errors(self, errors):
+        if errors:
+            self._write({"op": "errors", "errors": list(errors)})
+
+    def _write(self, record):
+        if self.read_only:
+            return
+        if self.file is None:
+            self.file = open(self.path, 'a', encoding='utf-8')
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.records_since_compaction += 1
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,135 @@
+import re
+
+def normalise_title(title):
+    # lower case, punctuation dropped and whitespace collapsed, e.g. 'Spider-Man: No Way Home' -> 'spider man no way home'
+    return ' '.join(re.sub(r'[^0-9a-z]+', ' ', str(title).lower()).split())
+
+def normalise_id(value):
+    # IDs come in as str, int or (from Excel) float, e.g. 603, '603' and 603.0 are all '603'
+    if value is None or value == '':
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+def normalise_year(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+class MovieStore:
+    # movie_data rows with hash indexes on Letterboxd slug and (title, year), the keys rows are merged on
+    # each index maps a key to the row indexes holding it, in row order, so duplicate rows are kept track of
+    # IMDb and TMDB IDs aren't indexed as nothing looks rows up by them, they only decide a row's identity
+    def __init__(self, rows=None):
+        self.rows = []
+        self.indexes = {"slug": {}, "title_year": {}}
+        for row in rows or []:
+            self.append(row)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+    def all_rows(self):
+        # a list of every row, in order, e.g. to save or write out (the rows themselves aren't copied)
+        return list(self.rows)
+
+    def row_keys(self, row):
+        keys = []
+        slug = row.get('Letterboxd Slug')
+        if slug:
+            keys.append(("slug", slug))
+        for field in ['IMDb ID', 'IMDb ID (from Letterboxd)']:
+            imdb_id = normalise_id(row.get(field))
+            if imdb_id:
+                keys.append(("imdb", imdb_id))
+        tmdb_id = normalise_id(row.get('TMDB ID (from Letterboxd)'))
+        if tmdb_id:
+            keys.append(("tmdb", tmdb_id))
+        year = normalise_year(row.get('Year'))
+        if row.get('Movie Title') is not None and year is not None:
+            keys.append(("title_year", (normalise_title(row['Movie Title']), year)))
+        return keys
+
+    def identity(self, row):
+        # the most specific key a row has, used to spot rows that are the same film
+        # title matches also need the same medium so e.g. a film and a mini series of the same name stay apart
+        for index_name, key in self.row_keys(row):
+            if index_name == "title_year":
+                return (index_name, key, row.get('Medium'))
+            return (index_name, key)
+        return None
+
+    def indexed_keys(self, row):
+        return set((index_name, key) for index_name, key in self.row_keys(row) if index_name in self.indexes)
+
+    def _index(self, position, row):
+        for index_name, key in self.indexed_keys(row):
+            self.indexes[index_name].setdefault(key, []).append(position)
+
+    def _unindex(self, position, row):
+        for index_name, key in self.indexed_keys(row):
+            positions = self.indexes[index_name][key]
+            positions.remove(position)
+            if not positions:
+                del self.indexes[index_name][key]
+
+    def append(self, row):
+        self.rows.append(row)
+        self._index(len(self.rows) - 1, row)
+        return len(self.rows) - 1
+
+    def replace(self, position, row):
+        self._unindex(position, self.rows[position])
+        self.rows[position] = row
+        self._index(position, row)
+
+    def update(self, position, fields):
+        row = dict(self.rows[position])
+        row.update(fields)
+        self.replace(position, row)
+
+    def merge(self, row):
+        # add a row, unless one for the same film already exists, in which case its blank fields are filled in
+        # returns (row index, fields filled in) where fields is None for a newly appended row
+        position = None
+        if row.get('Letterboxd Slug'):
+            position = self.find_by_slug(row['Letterboxd Slug'])
+        if position is None:
+            # a title/year match only counts if the existing row hasn't been matched to a different film
+            for candidate in self.find_all_by_title_year(row.get('Movie Title'), row.get('Year')):
+                if not self.rows[candidate].get('Letterboxd Slug') and row.get('Medium') in [None, self.rows[candidate].get('Medium')]:
+                    position = candidate
+                    break
+        if position is None:
+            return self.append(row), None
+        existing = self.rows[position]
+        fields = {k: v for k, v in row.items() if existing.get(k) is None and v is not None}
+        if fields:
+            self.update(position, fields)
+        return position, fields
+
+    def has_slug(self, slug):
+        return slug in self.indexes["slug"]
+
+    def _find(self, index_name, key):
+        positions = self.indexes[index_name].get(key)
+        return positions[0] if positions else None
+
+    def find_by_slug(self, slug):
+        return self._find("slug", slug)
+
+    def find_all_by_slug(self, slug):
+        return list(self.indexes["slug"].get(slug, []))
+
+    def find_all_by_title_year(self, title, year):
+        if title is None or normalise_year(year) is None:
+            return []
+        return list(self.indexes["title_year"].get((normalise_title(title), normalise_year(year)), []))
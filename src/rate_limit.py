@@ -0,0 +1,31 @@
+import threading
+import time
+
+class SiteLimiter:
+    # caps how many calls to one site run at once and how often a new call may start
+    def __init__(self, max_concurrent=None, requests_per_second=None):
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.min_interval = 1 / requests_per_second if requests_per_second else 0
+        self.lock = threading.Lock()
+        self.next_start = 0.0
+
+    def __enter__(self):
+        if self.slots is not None:
+            self.slots.acquire()
+        if self.min_interval:
+            # reserve the next start slot, then wait for it outside the lock
+            with self.lock:
+                now = time.monotonic()
+                start = max(now, self.next_start)
+                self.next_start = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.slots is not None:
+            self.slots.release()
+        return False
+
+def build_site_limiters(site_limits: dict):
+    return {site: SiteLimiter(**limits) for site, limits in site_limits.items()}
@@ -0,0 +1,119 @@
+import time
+from datetime import datetime
+from src.response_cache import SOURCE_TTLS
+
+DAY = 24 * 60 * 60
+
+# how long a fetched field counts as fresh, for fields that change after release
+# anything not listed (Director, Runtime, Budget, IDs etc.) is never refreshed once filled in
+FIELD_REFRESH_INTERVALS = {
+    "Letterboxd Average Rating": 7 * DAY,
+    "Letterboxd Rating Count": 7 * DAY,
+    "Letterboxd Review Count": 7 * DAY,
+    "IMDb Rating": 14 * DAY,
+    "Metascore": 60 * DAY,
+    "Tomatometer (Critic Score)": 14 * DAY,
+    "Popcornmeter (Audience Score)": 14 * DAY,
+    "Academy Award Nominations": 30 * DAY,
+    "Academy Award Wins": 30 * DAY,
+    "Academy Award Details": 30 * DAY,
+}
+# the site lookup that refetches each field
+FIELD_SOURCES = {
+    "Letterboxd Average Rating": "letterboxd",
+    "Letterboxd Rating Count": "letterboxd",
+    "Letterboxd Review Count": "letterboxd",
+    "IMDb Rating": "imdb",
+    "Metascore": "imdb",
+    "Tomatometer (Critic Score)": "rotten_tomatoes",
+    "Popcornmeter (Audience Score)": "rotten_tomatoes",
+    "Academy Award Nominations": "oscars",
+    "Academy Award Wins": "oscars",
+    "Academy Award Details": "oscars",
+}
+# requests a refresh of each source takes, at most (a Letterboxd film without a slug needs a search first)
+SOURCE_REQUEST_COSTS = {"letterboxd": 1, "imdb": 1, "rotten_tomatoes": 2, "oscars": 1}
+AWARDS_SOURCE = "oscars"
+
+# ratings of recent releases move fastest, so they are refreshed this many times as often
+RECENT_RELEASE_YEARS = 2
+RECENT_RELEASE_FACTOR = 4
+# and films older than this settle down, so are refreshed this many times less often
+OLD_RELEASE_YEARS = 15
+OLD_RELEASE_FACTOR = 4
+# however often a field is refreshed, it is never sooner than its site's SOURCE_TTLS in src/response_cache.py,
+# as until then a refresh would just read back the saved response
+# fields filled in before fetch times were kept are treated as this many intervals old
+UNKNOWN_FETCH_STALENESS = 2
+
+def field_interval(field, year, current_year):
+    # seconds before the field is due a refresh for a film from year, or None if it never is
+    interval = FIELD_REFRESH_INTERVALS.get(field)
+    if interval is None:
+        return None
+    age = current_year - year if year is not None else None
+    # nominations are final 2 years after release
+    if age is not None and FIELD_SOURCES[field] == AWARDS_SOURCE and age > 2:
+        return None
+    if age is not None and age <= RECENT_RELEASE_YEARS:
+        interval /= RECENT_RELEASE_FACTOR
+    elif age is not None and age >= OLD_RELEASE_YEARS:
+        interval *= OLD_RELEASE_FACTOR
+    return max(interval, SOURCE_TTLS[FIELD_SOURCES[field]])
+
+def field_staleness(fetched_at, interval, now):
+    # how many refresh intervals ago the field was fetched, 1 or more means it is due
+    if fetched_at is None:
+        return UNKNOWN_FETCH_STALENESS
+    return (now - fetched_at) / interval
+
+def source_request_cost(movie_dict, source, awards_index_loaded):
+    if source == AWARDS_SOURCE and awards_index_loaded:
+        return 0
+    if source == "letterboxd" and not movie_dict.get("Letterboxd Slug"):
+        return SOURCE_REQUEST_COSTS[source] + 1
+    return SOURCE_REQUEST_COSTS[source]
+
+def due_refreshes(movie_dict, fetched_at, now, current_year):
+    # {source: (staleness, interval)} for each source with a filled in field that is due, from its most overdue field
+    try:
+        year = int(movie_dict.get("Year"))
+    except (TypeError, ValueError):
+        year = None
+    due = {}
+    for field in FIELD_REFRESH_INTERVALS:
+        if movie_dict.get(field) is None:
+            # missing fields are filled in by the normal run, not refreshed
+            continue
+        interval = field_interval(field, year, current_year)
+        if interval is None:
+            continue
+        staleness = field_staleness(fetched_at.get(field), interval, now)
+        source = FIELD_SOURCES[field]
+        if staleness >= 1 and (source not in due or (staleness, -interval) > (due[source][0], -due[source][1])):
+            due[source] = (staleness, interval)
+    return due
+
+def build_refresh_queue(movie_data, fetched_at, budget, candidates=None, awards_index_loaded=False, now=None):
+    # picks which rows to refetch which sources for, spending at most budget requests
+    # most overdue first, then the most volatile (shortest refresh interval, which also favours recent films)
+    # returns [(row index, {sources})] in that order
+    now = now or time.time()
+    current_year = datetime.fromtimestamp(now).year
+    tasks = []
+    for index in candidates if candidates is not None else range(len(movie_data)):
+        movie_dict = movie_data[index]
+        row_fetched_at = fetched_at[index] if index < len(fetched_at) else {}
+        for source, (staleness, interval) in due_refreshes(movie_dict, row_fetched_at, now, current_year).items():
+            tasks.append((-staleness, interval, index, source))
+    tasks.sort()
+
+    queue = {}
+    spent = 0
+    for _, _, index, source in tasks:
+        cost = source_request_cost(movie_data[index], source, awards_index_loaded)
+        if spent + cost > budget:
+            continue
+        spent += cost
+        queue.setdefault(index, set()).add(source)
+    return list(queue.items())
@@ -1,65 +1,127 @@
 import requests
-from bs4 import BeautifulSoup
 import json
+import re
+import html
 from datetime import datetime
 import tmdbsimple as tmdb
 from letterboxdpy.user import User
 from letterboxdpy.movie import Movie
 from letterboxdpy.search import Search
+from letterboxdpy.pages.user_films import UserFilms, extract_movies_from_user_watched
+from letterboxdpy.core.scraper import Scraper, parse_url
+from letterboxdpy.utils.utils_url import get_page_url
+from src.response_cache import setup_cache, close_cache, cached, SOURCE_TTL, caching_responses, is_cached, cache_response
+from src.awards_index import setup_awards_index, get_awards_index
+from src import transport
+from src.transport import SiteUnavailable
+from src.instrumentation import instrumented
+from src.batching import BatchLoader
+
+USER_RATINGS_FILE = "user_ratings.json"
+LETTERBOXD_FILMS_PER_PAGE = 12 * 6
+# a user's film listings read by each sync: most recently watched first, then most recently rated first,
+# which is where a new rating of a film watched long ago shows up
+LETTERBOXD_SYNC_LISTINGS = ["", "/by/rated-date"]
+# Credit: https://imdbapi.dev/ - titles are fetched several at a time from the batch endpoint
+IMDB_BATCH_URL = "https://api.imdbapi.dev/titles:batchGet"
+IMDB_BATCH_SIZE = 5  # most titles the batch endpoint returns at once
+IMDB_BATCH_WAIT = 0.05  # seconds a batch waits for IDs from other movies being enriched at the same time
+
+def setup_apis(cache_mode='use', read_only=False):
+    # read_only (for a dry run) sends no requests and writes nothing: no response cache and only a saved awards index
+    # set up on-disk response cache ('use', 'refresh' or 'bypass')
+    if read_only:
+        close_cache()
+    else:
+        setup_cache(cache_mode)
+
+    # load (or rebuild if stale) the local Academy Awards index
+    setup_awards_index(rebuild=not read_only)
 
-def setup_apis():
     # set up TMDB API
     with open("tmdb_api_key.txt", 'r') as f:
         api_key = f.read()
     
     tmdb.API_KEY = api_key
-    tmdb.REQUESTS_TIMEOUT = 5  # seconds, for both connect and read
-    tmdb.REQUESTS_SESSION = requests.Session()
+    tmdb.REQUESTS_TIMEOUT = transport.SITE_TIMEOUTS["tmdb"]
+    tmdb.REQUESTS_SESSION = transport.get_session("tmdb")
+    # tmdbsimple asks the server to close the connection after every request, which defeats the pooled session
+    tmdb.base.TMDB.headers = {k: v for k, v in tmdb.base.TMDB.headers.items() if k != 'Connection'}
+
+    # letterboxdpy fetches several pages for some calls, so its session is wrapped to rate limit each request
+    if not isinstance(Scraper.instance(), transport.LimitedSession):
+        Scraper.set_instance(transport.LimitedSession("letterboxd", Scraper.instance()))
 
     return tmdb
 
-def search_tmdb(query, year, medium):
-    search = tmdb.Search()
-    response = search.tv(query=query, year=year) if medium in ['Documentary Mini Series', 'Mini Series'] else search.movie(query=query, year=year)
+def call_tmdb(method, **kwargs):
+    with transport.guarded("tmdb"):
+        return method(**kwargs)
+
+@instrumented("tmdb.search")
+def search_tmdb(query, year, medium, imdb_id=None):
+    is_tv = medium in ['Documentary Mini Series', 'Mini Series']
+
+    # an IMDb ID maps to exactly one TMDB entry, so use it instead of a title search where we have one
+    if type(imdb_id) is str:
+        try:
+            response = cached("tmdb", f"find/{imdb_id}", lambda: call_tmdb(tmdb.Find(imdb_id).info, external_source='imdb_id'))
+            results = response["tv_results"] if is_tv else response["movie_results"]
+            if results:
+                return results[0]["id"]
+        except SiteUnavailable:
+            raise
+        except:
+            pass
+
+    def fetch():
+        search = tmdb.Search()
+        return call_tmdb(search.tv, query=query, year=year) if is_tv else call_tmdb(search.movie, query=query, year=year)
+
     try:
-        return search.results[0]["id"]
+        response = cached("tmdb", f"search/{'tv' if is_tv else 'movie'}/{query}/{year}", fetch)
+        return response["results"][0]["id"]
+    except SiteUnavailable:
+        raise
     except:
         return None
 
+@instrumented("tmdb.retrieve")
 def retrieve_tmdb_data(movie_dict, tmdb_id, medium):
     is_tv = medium in ['Documentary Mini Series', 'Mini Series']
     item = tmdb.TV(tmdb_id) if is_tv else tmdb.Movies(tmdb_id)
+    # details, credits and (for movies) release certifications all come back in one request
+    append_to_response = 'credits' if is_tv else 'credits,releases'
 
     try:
-        response = item.credits()
+        info = cached("tmdb", f"{'tv' if is_tv else 'movie'}/{tmdb_id}", lambda: call_tmdb(item.info, append_to_response=append_to_response))
+    except SiteUnavailable:
+        raise
     except:
         return movie_dict
     directors = [] 
-    for credit in item.crew:  
+    for credit in info["credits"]["crew"]:  
         if credit["job"] == "Director":  
             directors.append(credit["name"])
     movie_dict["Director"] =     ', '.join(directors)
 
     # get basic movie info
-    response = item.info()
-    
     if not is_tv:
-        movie_dict["Runtime (minutes)"] = item.runtime
-        movie_dict["Budget"] = item.budget
-        movie_dict["Box Office"] = item.revenue
-        imdb_id = item.imdb_id
-        movie_dict["Franchise"] = item.belongs_to_collection["name"].replace(' Collection', '') if item.belongs_to_collection is not None and movie_dict["Franchise"] is None else movie_dict["Franchise"]
+        movie_dict["Runtime (minutes)"] = info["runtime"]
+        movie_dict["Budget"] = info["budget"]
+        movie_dict["Box Office"] = info["revenue"]
+        imdb_id = info["imdb_id"]
+        movie_dict["Franchise"] = info["belongs_to_collection"]["name"].replace(' Collection', '') if info["belongs_to_collection"] is not None and movie_dict["Franchise"] is None else movie_dict["Franchise"]
     
-    movie_dict["Country of Origin"] = ', '.join(item.origin_country)
-    movie_dict["Spoken Languages"] = ', '.join(country["english_name"] for country in item.spoken_languages)
+    movie_dict["Country of Origin"] = ', '.join(info["origin_country"])
+    movie_dict["Spoken Languages"] = ', '.join(country["english_name"] for country in info["spoken_languages"])
     
     # get classification
     if not is_tv:
-        response = item.releases()
         # tries to retrieve AUS classification, but will return US class if AUS not found
         us_class = ''
         aus_class = ''
-        for c in item.countries:
+        for c in info["releases"]["countries"]:
             if c['iso_3166_1'] == 'AU':
                 aus_class = c['certification']
                 break
@@ -72,22 +134,56 @@ def retrieve_tmdb_data(movie_dict, tmdb_id, medium):
     
     return movie_dict
 
+imdb_batcher = None
+
+def setup_imdb_batching(max_wait=IMDB_BATCH_WAIT):
+    # the site's rate limit applies per batch request (in transport.get) rather than per movie
+    global imdb_batcher
+    imdb_batcher = BatchLoader(fetch_imdb_titles, IMDB_BATCH_SIZE, max_wait)
+
+@instrumented("imdb.batch")
+def fetch_imdb_titles(imdb_ids):
+    # returns {imdb_id: title} for those of the (up to IMDB_BATCH_SIZE) IDs that were found
+    response = transport.get("imdb", IMDB_BATCH_URL, params={"titleIds": list(imdb_ids)}, headers={"accept": "application/json"})
+    if response.status_code != 200:
+        return {}
+    return {title["id"]: title for title in response.json().get("titles", [])}
+
+def prefetch_imdb_titles(imdb_ids):
+    # fetches titles not saved yet in full batches up front, so each movie's IMDb lookup then reads from the cache
+    if not caching_responses():
+        return
+    missing = sorted({imdb_id for imdb_id in imdb_ids if type(imdb_id) is str and not is_cached("imdb", imdb_id)})
+    for start in range(0, len(missing), IMDB_BATCH_SIZE):
+        try:
+            titles = fetch_imdb_titles(missing[start:start + IMDB_BATCH_SIZE])
+        except (requests.RequestException, SiteUnavailable):
+            # whatever is left is looked up movie by movie as usual
+            return
+        for imdb_id, title in titles.items():
+            cache_response("imdb", imdb_id, title)
+
+def imdb_id_of(movie_dict):
+    return movie_dict["IMDb ID"] if "IMDb ID" in movie_dict.keys() and movie_dict["IMDb ID"] is not None else movie_dict["IMDb ID (from Letterboxd)"] if "IMDb ID (from Letterboxd)" in movie_dict.keys() else None
+
+@instrumented("imdb.title")
 def search_imdb(movie_dict):
     # Credit: https://imdbapi.dev/
     imdb_data = {}
-    imdb_id = movie_dict["IMDb ID"] if "IMDb ID" in movie_dict.keys() and movie_dict["IMDb ID"] is not None else movie_dict["IMDb ID (from Letterboxd)"] if "IMDb ID (from Letterboxd)" in movie_dict.keys() else None
+    imdb_id = imdb_id_of(movie_dict)
     if type(imdb_id) is not str:
         return imdb_data
-    url = "https://api.imdbapi.dev/titles/" + imdb_id
 
-    headers = {"accept": "application/xml"}
-    try:
-        response = requests.get(url, headers=headers, timeout=3)
-    except Exception:
-        return imdb_data
-    
-    if response.status_code == 200:
-        imdb_response = response.json()
+    def fetch():
+        try:
+            if imdb_batcher is None:
+                return fetch_imdb_titles([imdb_id]).get(imdb_id)
+            return imdb_batcher.load(imdb_id)
+        except requests.RequestException:
+            return None
+
+    imdb_response = cached("imdb", imdb_id, fetch)
+    if imdb_response is not None:
         try:
             imdb_data["IMDb Rating"] = imdb_response["rating"]["aggregateRating"]
             imdb_data["Poster URL"] = imdb_response["primaryImage"]["url"]
@@ -99,43 +195,104 @@ def search_imdb(movie_dict):
         
     return imdb_data
 
+# Rotten Tomatoes pages are read with regexes over the raw HTML rather than a full BeautifulSoup parse:
+# we only need the search-page-media-row tags and one <script> blob per film
+RT_SEARCH_RESULT_PATTERN = re.compile(r'<search-page-result\b([^>]*)>(.*?)</search-page-result>', re.S | re.I)
+RT_MEDIA_ROW_PATTERN = re.compile(r'<search-page-media-row\b([^>]*)>(.*?)</search-page-media-row>', re.S | re.I)
+RT_TITLE_LINK_PATTERN = re.compile(r'<a\b([^>]*\sslot\s*=\s*(["\']?)title\2(?=[\s/>])[^>]*)>(.*?)</a>', re.S | re.I)
+RT_SCORECARD_PATTERN = re.compile(r'<script\b[^>]*\sid\s*=\s*(["\']?)media-scorecard-json\1(?=[\s/>])[^>]*>(.*?)</script>', re.S | re.I)
+HTML_ATTRIBUTE_PATTERN = re.compile(r'([^\s"\'>/=]+)(?:\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+)))?')
+HTML_TAG_PATTERN = re.compile(r'<[^>]*>')
+
+def parse_html_attributes(tag_text):
+    # attribute names are lower-cased and values unescaped, as html.parser does
+    attributes = {}
+    for match in HTML_ATTRIBUTE_PATTERN.finditer(tag_text):
+        name, double_quoted, single_quoted, unquoted = match.groups()
+        value = double_quoted if double_quoted is not None else single_quoted if single_quoted is not None else unquoted
+        attributes.setdefault(name.lower(), html.unescape(value) if value is not None else '')
+    return attributes
+
+def iter_rotten_tomatoes_search_rows(page, medium_type, release_year_str):
+    # yields (release year, title, cast, link) for each result row of the given type
+    for result in RT_SEARCH_RESULT_PATTERN.finditer(page):
+        if parse_html_attributes(result.group(1)).get('type') != medium_type:
+            continue
+        for movie_row in RT_MEDIA_ROW_PATTERN.finditer(result.group(2)):
+            row_attributes = parse_html_attributes(movie_row.group(1))
+            release_year = row_attributes.get(release_year_str, '')
+            if not release_year.isdigit():
+                continue
+            title_link = RT_TITLE_LINK_PATTERN.search(movie_row.group(2))
+            if title_link is None:
+                continue
+            rt_title = html.unescape(HTML_TAG_PATTERN.sub('', title_link.group(3))).strip()
+            link = parse_html_attributes(title_link.group(1)).get('href', '').strip()
+            yield int(release_year), rt_title, row_attributes.get('cast', ''), link
+
+def extract_rotten_tomatoes_scorecard(page):
+    scorecard_script = RT_SCORECARD_PATTERN.search(page)
+    if scorecard_script is None:
+        return None
+    return json.loads(scorecard_script.group(2).strip())
+
+def fetch_rotten_tomatoes_page(url):
+    response = transport.get("rotten_tomatoes", url)
+    return response.text if response.status_code == 200 else None
+
+# the row attribute holding the release year for each type of search result
+RT_RELEASE_YEAR_ATTRIBUTES = {"movie": "release-year", "tvSeries": "startyear"}
+
+# only what is read from each page is cached, not the page itself, which is many times the size
+# a fetched search page is read in full, for both result types, so matching can then run over the saved rows
+def fetch_rotten_tomatoes_search_rows(url):
+    page = fetch_rotten_tomatoes_page(url)
+    if page is None:
+        return None
+    return {
+        medium_type: list(iter_rotten_tomatoes_search_rows(page, medium_type, release_year_str))
+        for medium_type, release_year_str in RT_RELEASE_YEAR_ATTRIBUTES.items()
+    }
+
+def fetch_rotten_tomatoes_scorecard(url):
+    page = fetch_rotten_tomatoes_page(url)
+    if page is None:
+        return None
+    return {"scorecard": extract_rotten_tomatoes_scorecard(page)}
+
+@instrumented("rotten_tomatoes.scrape")
 def scrape_rotten_tomatoes(title, year, medium, full_cast:list):
     # Credit: https://github.com/placson/rottenmovies/blob/main/rotten.py
     rt_data = {} # write info to dict
     cleaned_title = ''.join([c if c.isalnum() else ' ' if c == ' ' or '.' else '' for c in str(title) ])
     medium_type = ("tvSeries" if medium in ['Documentary Mini Series', 'Mini Series'] else "movie")
-    release_year_str = ("startyear" if medium in ['Documentary Mini Series', 'Mini Series'] else "release-year")
 
     MOVIE_SEARCH_URL = "https://www.rottentomatoes.com/search?search=%s" 
     movie_url = MOVIE_SEARCH_URL % cleaned_title
     
-    response = requests.get(movie_url)
-    rt_response_html = BeautifulSoup(response.content, 'html.parser')
-    movie_results = rt_response_html.find_all('search-page-result',type=medium_type)
-    movie_results = BeautifulSoup(str(movie_results),'html.parser')
-    movie_rows = movie_results.find_all('search-page-media-row')    
-    for movie_row in movie_rows:
-        releaseYear = int(movie_row[release_year_str]) if movie_row[release_year_str].isdigit() else None
-        if releaseYear is None:
-            continue
-        href = movie_row.find('a',slot='title')
-        rt_title = href.text.strip()
-        cast = movie_row['cast']
+    try:
+        search_rows = cached("rotten_tomatoes", "search-rows:" + movie_url, lambda: fetch_rotten_tomatoes_search_rows(movie_url))
+    except requests.RequestException:
+        return rt_data
+    if search_rows is None:
+        return rt_data
+    for releaseYear, rt_title, cast, link in search_rows[medium_type]:
         # allow for year to be one more/one less in case of inconsistencies
         if int(year) in range(releaseYear-1, releaseYear+2) and (rt_title == title or set(cast.split(',')).issubset(set(full_cast))):
             # rt_data["Cast"] = cast
 
             # fetch details by going deeper into the exact movie link
-            link = href['href'].strip()
-            response = requests.get(link)
-            rt_response_html = BeautifulSoup(response.content, 'html.parser')
-            
-            # aggregate json (embedded in script at the top of the page)
-            agg_json = rt_response_html.find('script', type="application/ld+json").text.strip()
+            try:
+                film_page = cached("rotten_tomatoes", "scorecard:" + link, lambda: fetch_rotten_tomatoes_scorecard(link))
+            except requests.RequestException:
+                return rt_data
+            if film_page is None:
+                return rt_data
             
             # media scorecard json (embedded in script)
-            scorecard_json = rt_response_html.find('script', id="media-scorecard-json").text.strip()
-            scorecard = json.loads(scorecard_json)
+            scorecard = film_page["scorecard"]
+            if scorecard is None:
+                return rt_data
 
             # criticsScore (tomatometer)
             critics_score = scorecard['criticsScore']
@@ -157,26 +314,92 @@ def scrape_rotten_tomatoes(title, year, medium, full_cast:list):
             return rt_data
     return rt_data
 
-def get_letterboxd_user_ratings(username: str):
+def load_saved_user_ratings(username: str, ratings_file=USER_RATINGS_FILE):
+    # ratings saved by the last sync, if they were for this user
+    try:
+        with open(ratings_file, 'r') as f:
+            saved = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return saved if saved.get("username") == username else None
+
+def sync_new_letterboxd_films(username: str, known_movies: dict):
     # Credit: https://github.com/nmcassa/letterboxdpy
-    user_instance = User(username)
-    args = {}
-    method = User.get_films
-    if isinstance(method, list):
-        method, args = method
-    data = method(user_instance, **args) if args else method(user_instance)
-    with open("user_ratings.json", 'w') as f:
+    # each listing is most recent first, so its pages are read until one has nothing new or re-rated
+    changed_films = {}
+    films_url = UserFilms(username).url
+    for listing in LETTERBOXD_SYNC_LISTINGS:
+        page = 0
+        while True:
+            page += 1
+            movies = extract_movies_from_user_watched(parse_url(get_page_url(films_url + listing, page)))
+            page_changes = {slug: v for slug, v in movies.items() if slug not in known_movies or known_movies[slug]["rating"] != v["rating"]}
+            changed_films.update(page_changes)
+            if not page_changes or len(movies) < LETTERBOXD_FILMS_PER_PAGE:
+                break
+    return changed_films
+
+@instrumented("letterboxd.user_ratings")
+def get_letterboxd_user_ratings(username: str, full_resync=False, ratings_file=USER_RATINGS_FILE, read_only=False):
+    # returns all the user's logged films, plus just the ones that are new or re-rated since the last sync
+    # read_only returns the saved ratings (none if never synced) without going to Letterboxd or saving anything
+    data = load_saved_user_ratings(username, ratings_file)
+    if data is None and ratings_file != USER_RATINGS_FILE:
+        # a shard's first sync starts from the main saved ratings rather than re-downloading every film
+        data = load_saved_user_ratings(username)
+    if read_only:
+        return data or {"username": username, "movies": {}, "count": 0}, {}
+    if data is None or full_resync:
+        # Credit: https://github.com/nmcassa/letterboxdpy
+        user_instance = User(username)
+        args = {}
+        method = User.get_films
+        if isinstance(method, list):
+            method, args = method
+        data = method(user_instance, **args) if args else method(user_instance)
+        changed_films = dict(data["movies"])
+    else:
+        changed_films = sync_new_letterboxd_films(username, data["movies"])
+        data["movies"].update(changed_films)
+        data["count"] = len(data["movies"])
+    data["username"] = username
+    with open(ratings_file, 'w') as f:
         json.dump(data, f)
-    return data
+    return data, changed_films
+
+def search_letterboxd(query):
+    with transport.guarded("letterboxd"):
+        return Search(query, "films").results
+
+def get_letterboxd_movie_page(slug):
+    # only the parts of the letterboxdpy Movie we use, so they can be cached as JSON
+    with transport.guarded("letterboxd"):
+        movie = Movie(slug)
+    try:
+        aggregate_rating = {
+            "reviewCount": movie.pages.profile.script["aggregateRating"]["reviewCount"],
+            "ratingCount": movie.pages.profile.script["aggregateRating"]["ratingCount"]
+        }
+    except:
+        aggregate_rating = None
+    return {
+        "rating": movie.rating,
+        "aggregate_rating": aggregate_rating,
+        "cast": movie.cast,
+        "runtime": movie.runtime,
+        "tmdb_link": movie.tmdb_link,
+        "imdb_link": movie.imdb_link
+    }
 
+@instrumented("letterboxd.movie")
 def get_letterboxd_movie_data(title: str, year, user_ratings: dict, slug=None):
     # Credit: https://github.com/nmcassa/letterboxdpy
     letterboxd_data = {}
     year = int(year)
 
     if slug is None:
-        search_instance = Search(str(title).replace('/', ' '), "films")
-        search_data = search_instance.results
+        query = str(title).replace('/', ' ')
+        search_data = cached("letterboxd_search", query, lambda: search_letterboxd(query))
 
         if not search_data["available"]:
             return letterboxd_data
@@ -188,29 +411,53 @@ def get_letterboxd_movie_data(title: str, year, user_ratings: dict, slug=None):
                 break
 
     if slug:
-        movie = Movie(slug)
-        letterboxd_data["Letterboxd Average Rating"] = movie.rating
+        movie = cached("letterboxd", slug, lambda: get_letterboxd_movie_page(slug))
+        letterboxd_data["Letterboxd Average Rating"] = movie["rating"]
         movie_logged = slug in user_ratings["movies"]
         letterboxd_data["Letterboxd My Rating"] = (float(user_ratings["movies"][slug]["rating"])/2 if movie_logged and user_ratings["movies"][slug]["rating"] is not None else "Not Rated" if movie_logged else None) 
-        try:
-            letterboxd_data["Letterboxd Review Count"] = movie.pages.profile.script["aggregateRating"]["reviewCount"] 
-            letterboxd_data["Letterboxd Rating Count"] = movie.pages.profile.script["aggregateRating"]["ratingCount"] 
-        except:
-            pass
-        letterboxd_data["Cast (from Letterboxd)"] = ', '.join([entry["name"].replace(',', '') for entry in movie.cast]) if movie.cast is not None else None
-        letterboxd_data["Runtime (from Letterboxd)"] = movie.runtime
-        letterboxd_data["TMDB ID (from Letterboxd)"] = movie.tmdb_link.rsplit('/', 2)[1] if movie.tmdb_link is not None else None
-        letterboxd_data["IMDb ID (from Letterboxd)"] = movie.imdb_link.rsplit('/', 2)[1] if movie.imdb_link is not None else None
+        if movie["aggregate_rating"] is not None:
+            letterboxd_data["Letterboxd Review Count"] = movie["aggregate_rating"]["reviewCount"] 
+            letterboxd_data["Letterboxd Rating Count"] = movie["aggregate_rating"]["ratingCount"] 
+        letterboxd_data["Cast (from Letterboxd)"] = ', '.join([entry["name"].replace(',', '') for entry in movie["cast"]]) if movie["cast"] is not None else None
+        letterboxd_data["Runtime (from Letterboxd)"] = movie["runtime"]
+        letterboxd_data["TMDB ID (from Letterboxd)"] = movie["tmdb_link"].rsplit('/', 2)[1] if movie["tmdb_link"] is not None else None
+        letterboxd_data["IMDb ID (from Letterboxd)"] = movie["imdb_link"].rsplit('/', 2)[1] if movie["imdb_link"] is not None else None
         letterboxd_data["Letterboxd Slug"] = slug
 
     return letterboxd_data
     
+def request_oscars_data(imdb_id, year):
+    # per-film lookup, used when there is no local awards index
+    award_url = "https://web-production-b8145.up.railway.app/awards/imdb/" + imdb_id
+
+    def fetch():
+        try:
+            awards_response = transport.get("oscars", award_url)
+        except requests.RequestException:
+            return None
+        # a 404 is a real answer (no nominations) so is worth caching, other failures are retried next run
+        if awards_response.status_code == 200:
+            return {"status_code": 200, "json": awards_response.json()}
+        if awards_response.status_code == 404:
+            return {"status_code": 404, "json": None}
+        return None
+
+    # awards for films more than 2 years old will not change, so keep them until evicted
+    ttl = None if year < datetime.now().year - 2 else SOURCE_TTL
+    awards_response = cached("oscars", imdb_id, fetch, ttl) or {"status_code": None}
+    return awards_response["json"] if awards_response["status_code"] == 200 else None
+
+@instrumented("oscars.awards")
 def get_oscars_data(imdb_id, year):
     oscars_data = {}
-    award_url = "https://web-production-b8145.up.railway.app/awards/imdb/" + imdb_id
-    awards_response = requests.get(award_url)
-    if awards_response.status_code == 200:
-        awards_json = awards_response.json()
+    awards_index = get_awards_index()
+    if awards_index is not None:
+        # the index holds every nominated film, so a film missing from it had no nominations
+        awards_json = awards_index.get(imdb_id)
+    else:
+        awards_json = request_oscars_data(imdb_id, year)
+
+    if awards_json is not None:
         oscars_data["Academy Award Nominations"] = len(awards_json)
         
         num_wins = 0
@@ -237,4 +484,4 @@ def get_oscars_data(imdb_id, year):
         if year < datetime.now().year - 2:
             oscars_data["Academy Award Details"] = ''
 
-    return oscars_data
\ No newline at end of file
+    return oscars_data
@@ -0,0 +1,222 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+DAY = 24 * 60 * 60
+
+# how long (seconds) each source's responses are reused before being fetched again
+# None keeps an entry until it is evicted
+SOURCE_TTLS = {
+    "tmdb": 30 * DAY,
+    "imdb": 7 * DAY,
+    "rotten_tomatoes": 7 * DAY,
+    "letterboxd": 1 * DAY,
+    "letterboxd_search": 30 * DAY,
+    "oscars": 7 * DAY,
+}
+
+# cache modes: 'use' reads and writes, 'refresh' skips reads but stores new responses, 'bypass' ignores the cache
+CACHE_MODES = ['use', 'refresh', 'bypass']
+
+SOURCE_TTL = object()
+
+# last-used times of entries read are written this many at a time rather than on every read
+TOUCH_BATCH_SIZE = 500
+
+class ResponseCache:
+    def __init__(self, path="src/tmp/response_cache.sqlite", mode='use', max_entries=100000, ttls=None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Error: cache mode must be one of {CACHE_MODES}, not '{mode}'.")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.ttls = dict(SOURCE_TTLS, **(ttls or {}))
+        self.hits = {}
+        self.misses = {}
+        self.coalesced = {}
+        # fetches currently running, so the same (source, key) asked for again meanwhile waits for that result
+        self.in_flight = {}
+        # keys fetched this run, which 'refresh' mode may read back instead of fetching again
+        self.fetched_this_run = set()
+        # (source, key) -> time last read, not yet written to disk
+        self.pending_touches = {}
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "source TEXT, key TEXT, value TEXT, expires_at REAL, last_used REAL, "
+            "PRIMARY KEY (source, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self.conn.commit()
+        self.num_entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def get(self, source, key):
+        # returns the cached value, or None if missing, expired or the cache is not being read
+        value = self._read(source, key)
+        with self.lock:
+            counts = self.hits if value is not None else self.misses
+            counts[source] = counts.get(source, 0) + 1
+        return value
+
+    def contains(self, source, key):
+        return self._read(source, key, touch=False) is not None
+
+    def _read(self, source, key, touch=True):
+        if self.mode == 'bypass' or (self.mode == 'refresh' and (source, key) not in self.fetched_this_run):
+            return None
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT value, expires_at FROM responses WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            if row is None or (row[1] is not None and row[1] < now):
+                return None
+            if touch:
+                self.pending_touches[(source, key)] = now
+                if len(self.pending_touches) >= TOUCH_BATCH_SIZE:
+                    self._write_touches()
+                    self.conn.commit()
+        return json.loads(row[0])
+
+    def _write_touches(self):
+        # last_used only orders eviction, so a few reads lost to a crash don't matter
+        self.conn.executemany(
+            "UPDATE responses SET last_used = ? WHERE source = ? AND key = ?",
+            [(last_used, source, key) for (source, key), last_used in self.pending_touches.items()]
+        )
+        self.pending_touches.clear()
+
+    def set(self, source, key, value, ttl=SOURCE_TTL):
+        if self.mode == 'bypass' or value is None:
+            return
+        ttl = self.ttls.get(source) if ttl is SOURCE_TTL else ttl
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self.lock:
+            self.fetched_this_run.add((source, key))
+            existed = self.conn.execute(
+                "SELECT 1 FROM responses WHERE source = ? AND key = ?", (source, key)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (source, key, value, expires_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (source, key, json.dumps(value), expires_at, now)
+            )
+            if not existed:
+                self.num_entries += 1
+            if self.num_entries > self.max_entries:
+                self._evict()
+            self.conn.commit()
+
+    def fetch(self, source, key, fetch, ttl=SOURCE_TTL):
+        # serve from disk if possible, else call fetch() and store its result (None is never stored)
+        # while one thread is fetching a key, others asking for it wait for that result instead of fetching it too
+        value = self.get(source, key)
+        if value is not None:
+            return value
+        with self.lock:
+            future = self.in_flight.get((source, key))
+            leader = future is None
+            if leader:
+                future = self.in_flight[(source, key)] = Future()
+            else:
+                self.coalesced[source] = self.coalesced.get(source, 0) + 1
+        if not leader:
+            return future.result()
+        try:
+            # a fetch of this key may have finished between the read above and taking the lead
+            value = self._read(source, key, touch=False)
+            if value is None:
+                value = fetch()
+                self.set(source, key, value, ttl)
+            future.set_result(value)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[(source, key)]
+        return value
+
+    def entries(self, source, key_prefix=''):
+        # every saved (key, value) of a source whose key starts with key_prefix, expired or not
+        # these build indexes of what is already known rather than serve responses, so aren't counted as hits
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT key, value FROM responses WHERE source = ? AND substr(key, 1, ?) = ?", (source, len(key_prefix), key_prefix)
+            ).fetchall()
+        return [(key, json.loads(value)) for key, value in rows]
+
+    def _evict(self):
+        # drop least recently used entries down to 90% of the cap so eviction isn't run on every insert
+        target = int(self.max_entries * 0.9)
+        self._write_touches()
+        self.conn.execute(
+            "DELETE FROM responses WHERE rowid IN (SELECT rowid FROM responses ORDER BY last_used LIMIT ?)",
+            (self.num_entries - target,)
+        )
+        self.num_entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        sources = sorted(set(self.hits) | set(self.misses) | set(self.coalesced))
+        return {
+            source: {"hits": self.hits.get(source, 0), "misses": self.misses.get(source, 0), "coalesced": self.coalesced.get(source, 0)}
+            for source in sources
+        }
+
+    def flush(self):
+        with self.lock:
+            self._write_touches()
+            self.conn.commit()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
+
+response_cache = None
+
+def setup_cache(mode='use', **kwargs):
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = ResponseCache(mode=mode, **kwargs)
+    return response_cache
+
+def cached(source, key, fetch, ttl=SOURCE_TTL):
+    if response_cache is None:
+        return fetch()
+    return response_cache.fetch(source, key, fetch, ttl)
+
+def close_cache():
+    global response_cache
+    if response_cache is not None:
+        response_cache.close()
+    response_cache = None
+
+def flush_cache():
+    if response_cache is not None:
+        response_cache.flush()
+
+def get_cache_stats():
+    return response_cache.stats() if response_cache is not None else {}
+
+def caching_responses():
+    # whether fetched responses are being saved, i.e. fetching ahead of time is worth it
+    return response_cache is not None and response_cache.mode != 'bypass'
+
+def is_cached(source, key):
+    return response_cache is not None and response_cache.contains(source, key)
+
+def cache_response(source, key, value, ttl=SOURCE_TTL):
+    if response_cache is not None:
+        response_cache.set(source, key, value, ttl)
+
+def saved_responses(source, key_prefix=''):
+    if response_cache is None or response_cache.mode == 'bypass':
+        return []
+    return response_cache.entries(source, key_prefix)
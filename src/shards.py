@@ -0,0 +1,33 @@
+import hashlib
+import os
+from src.movie_store import normalise_title, normalise_year
+
+# a shard is (index, count): the index-th of count parts of movie_data, each processed by its own run
+# rows are split on a hash of their normalised title and year, which every row and new Letterboxd film has
+# and which stays the same from run to run and machine to machine, so each film always lands in the same shard
+
+def parse_shard(index, count):
+    if count is None:
+        if index is not None:
+            raise ValueError("Error: a shard needs the number of shards too.")
+        return None
+    if count < 1 or index is None or not 0 <= index < count:
+        raise ValueError(f"Error: shard must be between 0 and {count - 1} for {count} shards, not '{index}'.")
+    return index, count
+
+def shard_key(movie_dict):
+    return f"{normalise_title(movie_dict.get('Movie Title'))}|{normalise_year(movie_dict.get('Year'))}"
+
+def shard_of(movie_dict, count):
+    digest = hashlib.sha1(shard_key(movie_dict).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count
+
+def in_shard(movie_dict, shard):
+    return shard is None or shard_of(movie_dict, shard[1]) == shard[0]
+
+def shard_filename(filename, shard):
+    # the name a shard's files are saved under, e.g. movies_database_shard-0-of-4.xlsx
+    if shard is None:
+        return filename
+    root, extension = os.path.splitext(filename)
+    return f"{root}_shard-{shard[0]}-of-{shard[1]}{extension}"
@@ -0,0 +1,115 @@
+import difflib
+import threading
+from src.movie_store import normalise_title, normalise_id, normalise_year
+from src.response_cache import saved_responses
+
+# a match may be a year either side, as the Letterboxd and Rotten Tomatoes searches allow
+YEAR_TOLERANCE = 1
+# with fuzzy matching, how alike (0 to 1) a title must be to a known one when no known title is the same
+FUZZY_MATCH_CUTOFF = 0.9
+TV_MEDIUMS = ['Documentary Mini Series', 'Mini Series']
+
+class TitleResolver:
+    # Letterboxd slugs and TMDB IDs of films already seen, by normalised title and year
+    # filled from the user's logged films, rows already looked up and saved search and film page responses,
+    # so rows without a slug or TMDB ID can skip the site searches that would otherwise find them
+    # a title only resolves if every film known under it at the closest year agrees, otherwise the site is searched
+    def __init__(self, fuzzy=False):
+        self.fuzzy = fuzzy
+        # normalised title -> [(year, {"slug", "tmdb_id", "tmdb_is_tv"})]
+        self.films = {}
+        # slug -> (tmdb_id, tmdb_is_tv) from saved Letterboxd film pages
+        self.slug_tmdb_ids = {}
+        self.resolved = {"slug": 0, "tmdb_id": 0}
+        self.lock = threading.Lock()
+
+    def add(self, title, year, slug=None, tmdb_id=None, tmdb_is_tv=None):
+        # tmdb_is_tv is None where it isn't known whether a TMDB ID is for a film or a series
+        year = normalise_year(year)
+        tmdb_id = normalise_id(tmdb_id)
+        if title is None or year is None or not (slug or tmdb_id):
+            return
+        film = {"slug": slug or None, "tmdb_id": tmdb_id, "tmdb_is_tv": tmdb_is_tv}
+        with self.lock:
+            films = self.films.setdefault(normalise_title(title), [])
+            if (year, film) not in films:
+                films.append((year, film))
+
+    def add_film_page(self, slug, page):
+        tmdb_link = page.get("tmdb_link")
+        if tmdb_link:
+            with self.lock:
+                self.slug_tmdb_ids[slug] = (tmdb_link.rsplit('/', 2)[1], '/tv/' in tmdb_link)
+
+    def add_user_ratings(self, user_ratings):
+        for slug, film in user_ratings["movies"].items():
+            self.add(film.get("name"), film.get("year"), slug=slug)
+
+    def add_row(self, movie_dict):
+        self.add(
+            movie_dict.get('Movie Title'), movie_dict.get('Year'),
+            slug=movie_dict.get('Letterboxd Slug'), tmdb_id=movie_dict.get('TMDB ID (from Letterboxd)')
+        )
+
+    def add_saved_responses(self):
+        for _, search_data in saved_responses("letterboxd_search"):
+            for result in search_data.get("results", []):
+                self.add(result.get("title"), result.get("year"), slug=result.get("slug"))
+        for key, response in saved_responses("tmdb", "search/"):
+            is_tv = key.startswith("search/tv/")
+            for result in response.get("results", []):
+                title = result.get("name") if is_tv else result.get("title")
+                release_date = result.get("first_air_date") if is_tv else result.get("release_date")
+                self.add(title, (release_date or '')[:4], tmdb_id=result.get("id"), tmdb_is_tv=is_tv)
+        for slug, page in saved_responses("letterboxd"):
+            self.add_film_page(slug, page)
+
+    def candidates(self, title, year):
+        # the films known under title (or the closest known title, with fuzzy matching) nearest to year
+        year = normalise_year(year)
+        if title is None or year is None:
+            return []
+        normalised_title = normalise_title(title)
+        with self.lock:
+            films = self.films.get(normalised_title)
+            if films is None and self.fuzzy:
+                close_titles = difflib.get_close_matches(normalised_title, self.films.keys(), n=1, cutoff=FUZZY_MATCH_CUTOFF)
+                films = self.films[close_titles[0]] if close_titles else None
+            if not films:
+                return []
+            distance = min(abs(film_year - year) for film_year, _ in films)
+            if distance > YEAR_TOLERANCE:
+                return []
+            return [film for film_year, film in films if abs(film_year - year) == distance]
+
+    def only_value(self, values, kind):
+        values = set(value for value in values if value)
+        if len(values) != 1:
+            return None
+        with self.lock:
+            self.resolved[kind] += 1
+        return values.pop()
+
+    def resolve_slug(self, title, year):
+        return self.only_value((film["slug"] for film in self.candidates(title, year)), "slug")
+
+    def resolve_tmdb_id(self, title, year, medium=None):
+        # TMDB IDs of films and series are separate, so only IDs of the same kind (or of unknown kind) count
+        is_tv = medium in TV_MEDIUMS
+        tmdb_ids = []
+        for film in self.candidates(title, year):
+            tmdb_id, tmdb_is_tv = film["tmdb_id"], film["tmdb_is_tv"]
+            if tmdb_id is None and film["slug"] is not None:
+                with self.lock:
+                    tmdb_id, tmdb_is_tv = self.slug_tmdb_ids.get(film["slug"], (None, None))
+            if tmdb_is_tv in [None, is_tv]:
+                tmdb_ids.append(tmdb_id)
+        return self.only_value(tmdb_ids, "tmdb_id")
+
+def build_title_resolver(user_ratings, rows, fuzzy=False):
+    title_resolver = TitleResolver(fuzzy)
+    title_resolver.add_saved_responses()
+    title_resolver.add_user_ratings(user_ratings)
+    for row in rows:
+        title_resolver.add_row(row)
+    return title_resolver
@@ -0,0 +1,187 @@
+import contextlib
+import functools
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src.instrumentation import run_metrics
+
+# one keep-alive session per site, sized to how many calls to that site can be in flight at once
+SITE_POOL_SIZES = {"tmdb": 16, "imdb": 8, "rotten_tomatoes": 4, "oscars": 8}
+SITE_TIMEOUTS = {"tmdb": 5, "imdb": 5, "rotten_tomatoes": 10, "oscars": 10}  # seconds, for both connect and read
+DEFAULT_POOL_SIZE = 4
+DEFAULT_TIMEOUT = 10
+
+# rate limiting and server errors are retried with jittered exponential backoff, honouring Retry-After
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5  # seconds, doubled on each retry
+RETRY_BACKOFF_JITTER = 0.5  # seconds, random extra added to each backoff
+RETRY_BACKOFF_MAX = 30  # seconds
+
+# after this many failures in a row a site is skipped for the cool-down, then one trial call is let through
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 5 * 60  # seconds
+
+class SiteUnavailable(Exception):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, site, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.site = site
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    def check(self):
+        # raises if calls are currently being skipped, without taking the trial call slot
+        with self.lock:
+            if self.opened_at is not None and (time.monotonic() - self.opened_at < self.cooldown or self.trial_running):
+                raise SiteUnavailable(f"{self.site} is unavailable after {self.failures} failed calls in a row")
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                raise SiteUnavailable(f"{self.site} is unavailable after {self.failures} failed calls in a row")
+            # cool-down is over, let a single call through to see if the site is back
+            self.trial_running = True
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+# URL prefixes swapped for another before a request is sent, e.g. to point a site at a local stand-in server
+url_rewrites = {}
+
+def rewrite_url(url):
+    for prefix, replacement in url_rewrites.items():
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+    return url
+
+class SiteSession(requests.Session):
+    # every request, including ones tmdbsimple sends through the session, waits on the site's rate limit
+    def __init__(self, site):
+        super().__init__()
+        self.site = site
+
+    def request(self, method, url, *args, **kwargs):
+        with site_limit(self.site):
+            return super().request(method, rewrite_url(url), *args, **kwargs)
+
+class LimitedSession:
+    # wraps a client library's own session (letterboxdpy's curl_cffi one) so each of its requests waits on the site's rate limit
+    def __init__(self, site, session):
+        self.site = site
+        self.session = session
+
+    def get(self, url, **kwargs):
+        with site_limit(self.site):
+            return self.session.get(url, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+sessions = {}
+breakers = {}
+# the SiteLimiter (src/rate_limit.py) each site's requests wait on, set with set_site_limiters
+# only requests actually sent wait, so responses served from the cache never do
+site_limiters = {}
+registry_lock = threading.Lock()
+
+def get_breaker(site):
+    with registry_lock:
+        if site not in breakers:
+            breakers[site] = CircuitBreaker(site)
+        return breakers[site]
+
+def get_session(site):
+    with registry_lock:
+        if site not in sessions:
+            retry = Retry(
+                total=RETRY_TOTAL,
+                backoff_factor=RETRY_BACKOFF_FACTOR,
+                backoff_jitter=RETRY_BACKOFF_JITTER,
+                backoff_max=RETRY_BACKOFF_MAX,
+                status_forcelist=RETRY_STATUS_CODES,
+                allowed_methods=["GET"],
+                respect_retry_after_header=True,
+                raise_on_status=False
+            )
+            pool_size = SITE_POOL_SIZES.get(site, DEFAULT_POOL_SIZE)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+            session = SiteSession(site)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.hooks["response"].append(functools.partial(count_response_bytes, site))
+            sessions[site] = session
+        return sessions[site]
+
+def count_response_bytes(site, response, *args, **kwargs):
+    run_metrics.add_bytes(site, len(response.content))
+
+def set_site_limiters(limiters):
+    site_limiters.clear()
+    site_limiters.update(limiters)
+
+def site_limit(site):
+    limiter = site_limiters.get(site)
+    return limiter if limiter is not None else contextlib.nullcontext()
+
+def check_available(site):
+    get_breaker(site).check()
+
+def is_failure_status(status_code):
+    return status_code in RETRY_STATUS_CODES
+
+def get(site, url, **kwargs):
+    # GET through the site's pooled session; connection errors and retryable statuses count towards its breaker
+    breaker = get_breaker(site)
+    breaker.before_call()
+    kwargs.setdefault("timeout", SITE_TIMEOUTS.get(site, DEFAULT_TIMEOUT))
+    try:
+        response = get_session(site).get(url, **kwargs)
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    if is_failure_status(response.status_code):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+    return response
+
+@contextmanager
+def guarded(site):
+    # for calls made by client libraries (tmdbsimple, letterboxdpy) rather than through get()
+    # any exception counts as a failure except an HTTP error for a non-retryable status such as 404
+    # the site's rate limit is waited on by each request the call sends, see SiteSession and LimitedSession
+    breaker = get_breaker(site)
+    breaker.before_call()
+    try:
+        yield
+    except requests.HTTPError as e:
+        if e.response is not None and not is_failure_status(e.response.status_code):
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        raise
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
@@ -0,0 +1,127 @@
+import csv
+import math
+import os
+import pickle
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+
+# extra formats the output can also be saved in, next to the Excel file
+OUTPUT_FORMATS = ['csv', 'parquet']
+
+# the header style pandas' to_excel uses, so the streamed workbook looks the same
+HEADER_FONT = Font(bold=True)
+HEADER_BORDER = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+HEADER_ALIGNMENT = Alignment(horizontal='center', vertical='top')
+SHEET_NAME = "Sheet1"
+
+def input_signature(input_filename):
+    stat = os.stat(input_filename)
+    return stat.st_size, stat.st_mtime_ns
+
+def read_workbook(input_filename):
+    # python-calamine (if installed) parses far faster than openpyxl and gives pandas the same values
+    try:
+        import python_calamine
+        engine = 'calamine'
+    except ImportError:
+        engine = None
+    df = pd.read_excel(input_filename, header=0, engine=engine)
+    df = df.replace({float('nan'): None})
+    return df.to_dict('records')
+
+def read_input_rows(input_filename, snapshot_filename, save_snapshot=True):
+    # the parsed rows are kept in snapshot_filename and reused while the workbook's size and modified time are unchanged
+    # save_snapshot=False reads a snapshot but never writes one, e.g. for a dry run
+    signature = input_signature(input_filename)
+    try:
+        with open(snapshot_filename, 'rb') as f:
+            snapshot = pickle.load(f)
+        if snapshot["signature"] == signature:
+            return snapshot["rows"]
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, KeyError, TypeError):
+        pass
+    rows = read_workbook(input_filename)
+    if not save_snapshot:
+        return rows
+    os.makedirs(os.path.dirname(snapshot_filename) or '.', exist_ok=True)
+    # shards reading the same workbook at once each write their own tmp file
+    tmp_filename = f"{snapshot_filename}.{os.getpid()}.tmp"
+    with open(tmp_filename, 'wb') as f:
+        pickle.dump({"signature": signature, "rows": rows}, f)
+    os.replace(tmp_filename, snapshot_filename)
+    return rows
+
+def output_columns(rows):
+    # every key in order of first appearance, as pd.DataFrame(rows) would order them
+    columns = {}
+    for row in rows:
+        for key in row:
+            columns.setdefault(key, None)
+    return list(columns)
+
+def cell_value(value):
+    # blanks are written as empty cells, as pandas does for None and NaN
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value
+
+def write_xlsx(output_filename, rows, columns=None):
+    # streams rows straight into a write-only workbook instead of building a DataFrame first
+    columns = columns or output_columns(rows)
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(SHEET_NAME)
+    header = []
+    for column in columns:
+        cell = WriteOnlyCell(sheet, value=column)
+        cell.font = HEADER_FONT
+        cell.border = HEADER_BORDER
+        cell.alignment = HEADER_ALIGNMENT
+        header.append(cell)
+    sheet.append(header)
+    for row in rows:
+        sheet.append([cell_value(row.get(column)) for column in columns])
+    workbook.save(output_filename)
+
+def write_csv(output_filename, rows, columns=None):
+    columns = columns or output_columns(rows)
+    with open(output_filename, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for row in rows:
+            values = [cell_value(row.get(column)) for column in columns]
+            writer.writerow(['' if value is None else value for value in values])
+
+def write_parquet(output_filename, rows, columns=None):
+    columns = columns or output_columns(rows)
+    df = pd.DataFrame(rows, columns=columns)
+    # columns mixing numbers and text (e.g. Metascore's "Not Listed") are saved as text
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].map(lambda v: None if cell_value(v) is None else str(v))
+    df.to_parquet(output_filename, index=False)
+
+def check_output_formats(output_formats):
+    for output_format in output_formats or []:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Error: output format must be one of {OUTPUT_FORMATS}, not '{output_format}'.")
+
+def write_outputs(output_filename, rows, output_formats=None):
+    # writes the Excel file plus any of OUTPUT_FORMATS next to it, returning the files written
+    check_output_formats(output_formats)
+    columns = output_columns(rows)
+    write_xlsx(output_filename, rows, columns)
+    written = [output_filename]
+    for output_format in output_formats or []:
+        format_filename = output_filename.replace(".xlsx", "." + output_format)
+        if output_format == 'csv':
+            write_csv(format_filename, rows, columns)
+        else:
+            try:
+                write_parquet(format_filename, rows, columns)
+            except ImportError:
+                print("Error: Parquet output needs pyarrow installed ('pip install pyarrow'), skipping it.")
+                continue
+        written.append(format_filename)
+    return written
@@ -0,0 +1,20 @@
+import shutil
+import pytest
+from benchmarks.get_movie_info_throughput import set_up_run_folder
+from benchmarks.stand_in_servers import start_server, point_sites_at
+
+@pytest.fixture(scope="session")
+def stand_in_server():
+    server = start_server()
+    yield server
+    server.shutdown()
+
+@pytest.fixture
+def run_folder(stand_in_server, monkeypatch):
+    # a benchmark run folder (input workbook, saved Letterboxd ratings, tmp folder) with every site pointed at the stand-in server
+    # yields the workbook's filename, with the folder as the working directory
+    point_sites_at(stand_in_server.base_url)
+    folder, filename = set_up_run_folder(12)
+    monkeypatch.chdir(folder)
+    yield filename
+    shutil.rmtree(folder)
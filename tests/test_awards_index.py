@@ -0,0 +1,20 @@
+import json
+import os
+from src.awards_index import load_awards_index
+
+NOMINATION = {"category": "Best Picture", "names": ["Film"], "isWinner": True}
+
+def write_dump(tmp_path, nominations):
+    dump_file = tmp_path / "awards_dump.json"
+    dump_file.write_text(json.dumps(nominations))
+    return str(dump_file)
+
+def test_index_is_built_from_nominations_with_imdb_ids(tmp_path):
+    dump_file = write_dump(tmp_path, [dict(NOMINATION, imdbId="tt0000001"), dict(NOMINATION, category="Best Director")])
+    index = load_awards_index(str(tmp_path / "awards_index.pickle"), dump_file)
+    assert index.get("tt0000001") == [NOMINATION]
+
+def test_dump_without_imdb_ids_falls_back_to_per_film_lookups(tmp_path):
+    index_file = str(tmp_path / "awards_index.pickle")
+    assert load_awards_index(index_file, write_dump(tmp_path, [NOMINATION])) is None
+    assert not os.path.exists(index_file)
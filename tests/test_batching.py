@@ -0,0 +1,44 @@
+import threading
+import pytest
+from src.batching import BatchLoader
+
+def load_all(loader, keys):
+    results = {}
+    def load(key):
+        try:
+            results[key] = loader.load(key)
+        except Exception as e:
+            results[key] = e
+    threads = [threading.Thread(target=load, args=(key,)) for key in keys]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def fetch_upper(batches):
+    def fetch_batch(keys):
+        batches.append(list(keys))
+        return {key: key.upper() for key in keys if key != "missing"}
+    return fetch_batch
+
+def test_concurrent_keys_share_one_batch():
+    batches = []
+    loader = BatchLoader(fetch_upper(batches), max_batch_size=10, max_wait=1)
+    results = load_all(loader, ["a", "b", "c", "a", "missing"])
+    assert results == {"a": "A", "b": "B", "c": "C", "missing": None}
+    assert [sorted(batch) for batch in batches] == [["a", "b", "c", "missing"]]
+
+def test_batches_are_sent_once_full():
+    batches = []
+    loader = BatchLoader(fetch_upper(batches), max_batch_size=2, max_wait=1)
+    results = load_all(loader, ["a", "b", "c", "d"])
+    assert results == {"a": "A", "b": "B", "c": "C", "d": "D"}
+    assert sorted(len(batch) for batch in batches) == [2, 2]
+
+def test_a_failed_batch_fails_each_of_its_keys():
+    def fetch_batch(keys):
+        raise ValueError("batch failed")
+    loader = BatchLoader(fetch_batch, max_batch_size=2, max_wait=0)
+    with pytest.raises(ValueError):
+        loader.load("a")
@@ -0,0 +1,19 @@
+from src.fetch_planner import FETCH_ORDER, SOURCE_FIELDS, ID_FIELDS, plan_frame, build_fetch_plan
+
+def filled_row(**fields):
+    row = {field: 1 for fields in SOURCE_FIELDS.values() for field in fields}
+    row.update((field, 1) for field in ID_FIELDS)
+    row.update(fields)
+    return row
+
+def test_rows_queued_only_for_a_refresh_are_only_refreshed():
+    # Rotten Tomatoes never matched this film and TMDB has no Classification for it
+    row = filled_row(**{"Classification": None, "Tomatometer (Critic Score)": None, "Popcornmeter (Audience Score)": None})
+    frame = plan_frame([row, row], [0, 1])
+    plan = build_fetch_plan(frame, {1: {"letterboxd"}}, refresh_only={1})
+    assert plan.loc[0].to_dict() == {"tmdb": True, "imdb": False, "oscars": False, "rotten_tomatoes": True, "letterboxd": False}
+    assert plan.loc[1].to_dict() == {source: source == "letterboxd" for source in FETCH_ORDER}
+
+def test_empty_plan():
+    plan = build_fetch_plan(plan_frame([], []), {}, refresh_only=set())
+    assert len(plan) == 0
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+import pytest
+import src.get_movie_info
+from benchmarks.get_movie_info_throughput import BENCHMARK_USERNAME
+from src.fetch_planner import FETCH_ORDER
+from src.get_movie_info import get_movie_info, get_journal, merge_shards, SITE_LIMITS
+from src.journal import Journal
+from src.movie_store import MovieStore
+from src.workbook_io import read_workbook
+
+NO_LIMITS = {site: {} for site in SITE_LIMITS}
+ONE_PER_SECOND = {site: {"max_concurrent": 1, "requests_per_second": 1} for site in SITE_LIMITS}
+
+class CountingLimiter:
+    def __init__(self, counts, site):
+        self.counts = counts
+        self.site = site
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        with self.lock:
+            self.counts[self.site] = self.counts.get(self.site, 0) + 1
+
+    def __exit__(self, *exc_info):
+        return False
+
+def test_update_with_nothing_to_look_up_still_writes_output(run_folder):
+    output_filename = "output/output-" + run_folder
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True)
+    rows = read_workbook(output_filename)
+    os.remove(output_filename)
+
+    plan = get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='u', check_all=False, dry_run=True)
+    assert len(plan) == 0
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='u', check_all=False)
+    assert read_workbook(output_filename) == rows
+
+def test_saved_responses_do_not_wait_on_rate_limits(run_folder):
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True)
+    # every lookup is now saved, so only the ratings sync goes to a site; were lookups limited it would take over a minute
+    start = time.perf_counter()
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=ONE_PER_SECOND, mode='s', check_all=True)
+    assert time.perf_counter() - start < 10
+
+def test_rate_limits_count_each_request(run_folder, stand_in_server, monkeypatch):
+    limited = {}
+    monkeypatch.setattr("src.get_movie_info.build_site_limiters", lambda site_limits: {site: CountingLimiter(limited, site) for site in site_limits})
+    stand_in_server.reset_counts()
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True, max_workers=4)
+    assert limited == stand_in_server.reset_counts()
+
+def test_rows_are_saved_as_their_lookups_finish(run_folder, monkeypatch):
+    output_filename = "output/output-" + run_folder
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True)
+    rows = read_workbook(output_filename)
+    full_rows, _ = get_journal(run_folder).replay()
+
+    # Letterboxd is looked up last, so the run stops with 5 rows done and the rest part way through
+    get_letterboxd_movie_data = src.get_movie_info.get_letterboxd_movie_data
+    calls = []
+    def stop_on_sixth_film(*args):
+        calls.append(1)
+        if len(calls) == 6:
+            raise KeyboardInterrupt
+        return get_letterboxd_movie_data(*args)
+    monkeypatch.setattr(src.get_movie_info, "get_letterboxd_movie_data", stop_on_sixth_film)
+    with pytest.raises(KeyboardInterrupt):
+        get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True, cache_mode='bypass')
+    saved_rows, _ = get_journal(run_folder).replay()
+    assert saved_rows[:5] == full_rows[:5]
+    assert saved_rows[5] != full_rows[5]
+
+    monkeypatch.setattr(src.get_movie_info, "get_letterboxd_movie_data", get_letterboxd_movie_data)
+    os.remove(output_filename)
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='u', check_all=True)
+    assert read_workbook(output_filename) == rows
+
+def test_merged_shards_match_an_unsharded_run(run_folder):
+    output_filename = "output/output-" + run_folder
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True)
+    rows = read_workbook(output_filename)
+    os.remove(output_filename)
+
+    for index in range(3):
+        get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True, shard=(index, 3))
+    merge_shards(run_folder, 3)
+    assert read_workbook(output_filename) == rows
+
+def test_refresh_only_rows_look_up_nothing_but_their_refresh(monkeypatch):
+    def not_looked_up(*args):
+        raise AssertionError("looked up a source that wasn't refreshed")
+    for name in ["search_tmdb", "retrieve_tmdb_data", "scrape_rotten_tomatoes", "search_imdb"]:
+        monkeypatch.setattr(src.get_movie_info, name, not_looked_up)
+    monkeypatch.setattr(src.get_movie_info, "get_letterboxd_movie_data", lambda *args: {"Letterboxd Average Rating": 4.1})
+    row = {"Movie Title": "Film", "Year": 2001, "Medium": "Movie", "Classification": None, "Tomatometer (Critic Score)": None}
+    lookups, _, finish = src.get_movie_info.prepare_enrichment(row, {"movies": {}}, {"letterboxd"}, refresh_only=True)
+    for source in FETCH_ORDER:
+        lookups[source]()
+    movie_dict, errors, fetched_fields = finish()
+    assert (movie_dict["Letterboxd Average Rating"], errors, fetched_fields) == (4.1, [], {"Letterboxd Average Rating"})
+
+def list_files():
+    return sorted(os.path.join(folder, name) for folder, _, names in os.walk(".") for name in names)
+
+def test_dry_run_sends_no_requests_and_writes_no_files(run_folder, stand_in_server):
+    files = list_files()
+    stand_in_server.reset_counts()
+    get_movie_info(run_folder, BENCHMARK_USERNAME, site_limits=NO_LIMITS, mode='s', check_all=True, dry_run=True)
+    assert stand_in_server.reset_counts() == {}
+    assert list_files() == files
+
+def test_rerated_films_take_their_new_rating(tmp_path):
+    rows = [
+        {"Movie Title": "Film 1", "Letterboxd Slug": "film-1", "Letterboxd My Rating": 3.0},
+        {"Movie Title": "Film 2", "Letterboxd Slug": "film-2", "Letterboxd My Rating": None},
+    ]
+    movie_store = MovieStore(rows)
+    journal = Journal(str(tmp_path / "journal.jsonl"))
+    journal.compact(rows, set(), [])
+    ratings = {"movies": {"film-1": {"name": "Film 1", "rating": 9}, "film-2": {"name": "Film 2", "rating": 4}}}
+    src.get_movie_info.update_letterboxd_ratings(movie_store, ratings, journal)
+    journal.close()
+    # a row not yet rated is left to its Letterboxd lookup
+    assert [row["Letterboxd My Rating"] for row in movie_store] == [4.5, None]
+    assert Journal(journal.path).replay()[0] == list(movie_store)
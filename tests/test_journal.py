@@ -0,0 +1,84 @@
+from src.journal import Journal
+
+ROWS = [{"Movie Title": "Film 1", "Year": 2001}, {"Movie Title": "Film 2", "Year": 2002}]
+
+def started_journal(tmp_path, **kwargs):
+    journal = Journal(str(tmp_path / "journal.jsonl"), **kwargs)
+    journal.compact([dict(row) for row in ROWS], set(), [])
+    return journal
+
+def test_replay_rebuilds_rows_errors_and_fetch_times(tmp_path):
+    journal = started_journal(tmp_path)
+    journal.update_row(1, {"Director": "Someone"}, {"Director": 100})
+    journal.append_row({"Movie Title": "Film 3", "Year": 2003})
+    journal.update_row(2, {"Director": "Someone Else"})
+    journal.add_errors(["Error: TMDB - Film 3 not found"])
+    journal.close()
+
+    replayed = Journal(journal.path)
+    rows, errors = replayed.replay()
+    assert rows == [ROWS[0], dict(ROWS[1], Director="Someone"), {"Movie Title": "Film 3", "Year": 2003, "Director": "Someone Else"}]
+    assert errors == {"Error: TMDB - Film 3 not found"}
+    assert replayed.fetched_at == [{}, {"Director": 100}, {}]
+
+def test_replay_after_a_crash_drops_the_half_written_line(tmp_path):
+    journal = started_journal(tmp_path)
+    journal.update_row(0, {"Director": "Someone"}, {"Director": 100})
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "update", "index": 1, "fie')
+
+    replayed = Journal(journal.path)
+    rows, _ = replayed.replay()
+    assert rows == [dict(ROWS[0], Director="Someone"), ROWS[1]]
+    # later records start on a clean line, so the journal still replays
+    replayed.update_row(1, {"Director": "Someone Else"})
+    replayed.close()
+    rows, _ = Journal(journal.path).replay()
+    assert rows == [dict(ROWS[0], Director="Someone"), dict(ROWS[1], Director="Someone Else")]
+
+def test_read_only_replay_leaves_a_half_written_line(tmp_path):
+    journal = started_journal(tmp_path)
+    journal.close()
+    with open(journal.path, 'a', encoding='utf-8') as f:
+        f.write('{"op": "upd')
+    with open(journal.path, 'rb') as f:
+        content = f.read()
+
+    read_only = Journal(journal.path, read_only=True)
+    assert read_only.replay()[0] == ROWS
+    read_only.update_row(0, {"Director": "Someone"}, {"Director": 100})
+    read_only.compact(ROWS, set())
+    with open(journal.path, 'rb') as f:
+        assert f.read() == content
+
+def test_compaction_keeps_state_in_one_line(tmp_path):
+    journal = started_journal(tmp_path, compact_every=3)
+    rows = [dict(row) for row in ROWS]
+    for number in range(3):
+        rows[0]["Director"] = f"Director {number}"
+        journal.update_row(0, {"Director": rows[0]["Director"]}, {"Director": number})
+    assert journal.needs_compaction()
+    journal.compact(rows, {"Error: an error"})
+    assert not journal.needs_compaction()
+    with open(journal.path, encoding='utf-8') as f:
+        assert len(f.readlines()) == 1
+
+    replayed = Journal(journal.path)
+    assert replayed.replay() == (rows, {"Error: an error"})
+    assert replayed.fetched_at == [{"Director": 2}, {}]
+
+def test_fetch_times_stay_aligned_with_rows(tmp_path):
+    journal = started_journal(tmp_path)
+    journal.append_row({"Movie Title": "Film 3", "Year": 2003})
+    journal.update_row(2, {}, {"IMDb Rating": 100})
+    assert journal.fetched_at == [{}, {}, {"IMDb Rating": 100}]
+    # compaction pads fetch times for rows added without a journal record, and drops those of rows no longer there
+    journal.compact(ROWS + [{}, {}, {}], set())
+    assert journal.fetched_at == [{}, {}, {"IMDb Rating": 100}, {}, {}]
+    journal.compact(ROWS, set())
+    assert journal.fetched_at == [{}, {}]
+    journal.close()
+    replayed = Journal(journal.path)
+    replayed.replay()
+    assert replayed.fetched_at == [{}, {}]
@@ -0,0 +1,22 @@
+import src.request_movie_site_data
+from src.request_movie_site_data import LETTERBOXD_FILMS_PER_PAGE, sync_new_letterboxd_films
+
+USER_FILMS_URL = "https://letterboxd.com/benchmark-user/films"
+
+def film(rating):
+    return {"name": "Film", "year": 2000, "rating": rating}
+
+def serve_pages(monkeypatch, pages):
+    # pages is {url: {slug: film}}, any other page is empty
+    monkeypatch.setattr(src.request_movie_site_data, "parse_url", lambda url: url)
+    monkeypatch.setattr(src.request_movie_site_data, "extract_movies_from_user_watched", lambda url: pages.get(url, {}))
+
+def test_new_ratings_of_films_watched_long_ago_are_synced(monkeypatch):
+    known_movies = {f"film-{number}": film(6) for number in range(LETTERBOXD_FILMS_PER_PAGE * 2)}
+    watched_page = {f"film-{number}": film(6) for number in range(LETTERBOXD_FILMS_PER_PAGE)}
+    serve_pages(monkeypatch, {
+        f"{USER_FILMS_URL}/page/1/": dict(watched_page, **{"new-film": film(8)}),
+        f"{USER_FILMS_URL}/page/2/": watched_page,
+        f"{USER_FILMS_URL}/by/rated-date/page/1/": {"film-100": film(10), "film-1": film(6)},
+    })
+    assert sync_new_letterboxd_films("benchmark-user", known_movies) == {"new-film": film(8), "film-100": film(10)}
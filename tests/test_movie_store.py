@@ -0,0 +1,21 @@
+from src.movie_store import MovieStore
+
+def test_merge_fills_in_the_row_for_the_same_film():
+    store = MovieStore([{"Movie Title": "Film", "Year": 2001, "Medium": "Movie", "Letterboxd Slug": None, "Director": None}])
+    index, fields = store.merge({"Movie Title": "Film", "Year": 2001, "Medium": None, "Letterboxd Slug": "film", "Director": None})
+    assert (index, fields) == (0, {"Letterboxd Slug": "film"})
+    assert store.find_by_slug("film") == 0
+
+def test_merge_appends_a_film_whose_title_matches_a_row_for_another():
+    store = MovieStore([{"Movie Title": "Film", "Year": 2001, "Letterboxd Slug": "film"}])
+    index, fields = store.merge({"Movie Title": "Film", "Year": 2001, "Letterboxd Slug": "film-2001"})
+    assert (index, fields) == (1, None)
+    assert len(store) == 2
+
+def test_updates_keep_the_slug_index_current():
+    store = MovieStore([{"Movie Title": "Film", "Year": 2001, "Letterboxd Slug": "film"}])
+    store.update(0, {"Letterboxd Slug": "film-2001"})
+    assert (store.find_by_slug("film"), store.find_by_slug("film-2001")) == (None, 0)
+    rows = store.all_rows()
+    rows.append({})
+    assert len(store) == 1
@@ -0,0 +1,18 @@
+from src.refresh_scheduler import FIELD_REFRESH_INTERVALS, FIELD_SOURCES, field_interval
+from src.response_cache import SOURCE_TTLS
+
+CURRENT_YEAR = 2025
+
+def test_fields_are_never_refreshed_before_their_saved_responses_expire():
+    for field in FIELD_REFRESH_INTERVALS:
+        for year in [None] + list(range(CURRENT_YEAR - 40, CURRENT_YEAR + 2)):
+            interval = field_interval(field, year, CURRENT_YEAR)
+            if interval is not None:
+                assert interval >= SOURCE_TTLS[FIELD_SOURCES[field]], (field, year)
+
+def test_recent_films_are_refreshed_more_often_than_old_ones():
+    assert field_interval("Letterboxd Average Rating", CURRENT_YEAR, CURRENT_YEAR) < field_interval("Letterboxd Average Rating", CURRENT_YEAR - 30, CURRENT_YEAR)
+
+def test_awards_are_not_refreshed_once_final():
+    assert field_interval("Academy Award Nominations", CURRENT_YEAR - 1, CURRENT_YEAR) is not None
+    assert field_interval("Academy Award Nominations", CURRENT_YEAR - 3, CURRENT_YEAR) is None
@@ -0,0 +1,57 @@
+import threading
+from src.response_cache import ResponseCache
+
+def open_cache(tmp_path, **kwargs):
+    return ResponseCache(path=str(tmp_path / "response_cache.sqlite"), **kwargs)
+
+def last_used(cache, key):
+    return cache.conn.execute("SELECT last_used FROM responses WHERE source = 'imdb' AND key = ?", (key,)).fetchone()[0]
+
+def test_reads_touch_entries_once_flushed(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.set("imdb", "tt1", {"rating": 7})
+    stored_at = last_used(cache, "tt1")
+    assert cache.get("imdb", "tt1") == {"rating": 7}
+    assert last_used(cache, "tt1") == stored_at
+    cache.flush()
+    assert last_used(cache, "tt1") > stored_at
+    cache.close()
+
+def test_eviction_sees_unwritten_reads(tmp_path):
+    cache = open_cache(tmp_path, max_entries=10)
+    for number in range(10):
+        cache.set("imdb", f"tt{number}", {"rating": number})
+    cache.get("imdb", "tt0")
+    # going over the cap evicts the two least recently used, which the read above makes tt1 and tt2
+    cache.set("imdb", "tt10", {"rating": 10})
+    assert cache.get("imdb", "tt0") == {"rating": 0}
+    assert cache.get("imdb", "tt1") is None
+    assert cache.get("imdb", "tt3") == {"rating": 3}
+    cache.close()
+
+def test_concurrent_fetches_of_one_key_fetch_once(tmp_path):
+    cache = open_cache(tmp_path)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"rating": 8}
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.fetch("imdb", "tt1", fetch)))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(cache.fetch("imdb", "tt1", fetch)))
+    follower.start()
+    while not cache.coalesced:
+        pass
+    release.set()
+    leader.join()
+    follower.join()
+    assert results == [{"rating": 8}, {"rating": 8}]
+    assert len(calls) == 1
+    cache.close()
@@ -0,0 +1,24 @@
+import pytest
+from src.transport import CircuitBreaker, SiteUnavailable
+
+def test_breaker_opens_after_failures_in_a_row_and_lets_one_trial_through():
+    breaker = CircuitBreaker("tmdb", failure_threshold=2, cooldown=0)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.before_call()
+    breaker.record_failure()
+    # the cool-down is over straight away, so one trial call goes through while others are still skipped
+    breaker.before_call()
+    with pytest.raises(SiteUnavailable):
+        breaker.before_call()
+    breaker.record_success()
+    breaker.before_call()
+
+def test_open_breaker_skips_calls_during_cooldown():
+    breaker = CircuitBreaker("imdb", failure_threshold=1, cooldown=60)
+    breaker.record_failure()
+    with pytest.raises(SiteUnavailable):
+        breaker.check()
+    with pytest.raises(SiteUnavailable):
+        breaker.before_call()